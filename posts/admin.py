@@ -1,20 +1,105 @@
+import datetime
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
 from .models import Post, Group, Comment
+from .search import filter_posts
+
+
+# Пагинатор списков админки для больших таблиц: без полного COUNT(*).
+# Для списка без фильтров количество оценивается по максимальному id (одно чтение индекса),
+# для отфильтрованного - считается, но не дальше count_limit строк.
+# После удалений оценка завышена: последние страницы списка могут оказаться пустыми
+class EstimatedCountPaginator(Paginator):
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return queryset.model.objects.aggregate(last=Max("pk"))["last"] or 0
+        return queryset.order_by()[:self.count_limit].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Не выводим "N из M" - это еще один COUNT(*) по всей таблице
+    show_full_result_count = False
+
+
+# Фильтр постов по году публикации вместо date_hierarchy: навигация date_hierarchy
+# строится через QuerySet.dates(), а это полный просмотр таблицы на SQLite.
+# Годы берутся из первой и последней даты (два чтения индекса post_pub_date_idx),
+# выбранный год фильтруется диапазоном дат по тому же индексу
+class PubDateYearFilter(admin.SimpleListFilter):
+    title = "год публикации"
+    parameter_name = "year"
 
+    def lookups(self, request, model_admin):
+        first = Post.objects.aggregate(first=Min("pub_date"))["first"]
+        last = Post.objects.aggregate(last=Max("pub_date"))["last"]
+        if first is None:
+            return []
+        return [
+            (str(year), str(year))
+            for year in range(timezone.localtime(last).year, timezone.localtime(first).year - 1, -1)
+        ]
 
-class PostAdmin(admin.ModelAdmin):
+    def queryset(self, request, queryset):
+        value = self.value() or ""
+        if not value.isdigit() or not datetime.MINYEAR <= int(value) < datetime.MAXYEAR:
+            return queryset
+        year = int(value)
+        return queryset.filter(
+            pub_date__gte=timezone.make_aware(datetime.datetime(year, 1, 1)),
+            pub_date__lt=timezone.make_aware(datetime.datetime(year + 1, 1, 1)),
+        )
+
+
+class PostAdmin(LargeTableAdmin):
     # Перечисляем поля, которые должны отображаться в админке
-    list_display = ("pk", "text", "pub_date", "author") 
-    # Добавляем интерфейс для поиска по тексту постов
-    search_fields = ("text",) 
-    # Добавляем возможность фильтрации по дате
-    list_filter = ("pub_date",)
+    list_display = ("pk", "text", "pub_date", "author", "group", "comment_count")
+    # Авторы и сообщества загружаются в том же запросе, что и посты
+    list_select_related = ("author", "group")
+    # Добавляем интерфейс для поиска по тексту постов (по полнотекстовому индексу)
+    search_fields = ("text",)
+    # Добавляем возможность фильтрации по дате (диапазоны дат по индексу post_pub_date_idx)
+    list_filter = ("pub_date", PubDateYearFilter)
+    # Сортировка по индексу post_pub_date_idx
+    ordering = ("-pub_date", "-id")
+    # Вместо выпадающих списков всех пользователей и сообществ
+    raw_id_fields = ("author",)
+    autocomplete_fields = ("group",)
     # Это свойство сработает для всех колонок: где пусто - там будет эта строка
     empty_value_display = "-пусто-"
-    
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ("pk", "title", "slug")
+    # Нужно для автодополнения сообщества в PostAdmin
+    search_fields = ("title", "slug")
+    prepopulated_fields = {"slug": ("title",)}
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ("pk", "text", "created", "author", "post")
+    list_select_related = ("author", "post")
+    search_fields = ("text",)
+    raw_id_fields = ("post", "author")
+    empty_value_display = "-пусто-"
+
 
 # Регистрация моделей
 # При регистрации модели Post источником конфигурации для неё назначаем класс PostAdmin
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
\ No newline at end of file
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
@@ -0,0 +1,111 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .feed_cache import versioned_cache_response
+from .models import Post, Group, Comment, Follow, TimelineEntry
+from .pagination import POSTS_PER_PAGE, CursorPaginator, decode_cursor, encode_cursor
+from . import timeline
+
+User = get_user_model()
+
+# Не больше стольких строк на страницу при ?limit=
+MAX_LIMIT = 100
+
+# Поля ответа и соответствующие им поля .values().
+# Связанные объекты отдаются одним значением (username автора, slug сообщества)
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comment_count": "comment_count",
+}
+# Лента подписок в режиме "push" читается из TimelineEntry (автор и дата есть в самой записи)
+TIMELINE_FIELDS = {
+    name: field if name in ("pub_date", "author") else f"post__{field}" for name, field in POST_FIELDS.items()
+}
+TIMELINE_FIELDS["id"] = "post_id"
+COMMENT_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "created": "created",
+    "author": "author__username",
+}
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def get_limit(request):
+    try:
+        return min(max(int(request.GET.get("limit", POSTS_PER_PAGE)), 1), MAX_LIMIT)
+    except ValueError:
+        return POSTS_PER_PAGE
+
+
+# Страница ленты в JSON: {"results": [...], "next": "?after=..."}.
+# Строки читаются из .values().iterator() и сразу сериализуются, без создания
+# объектов моделей и рендеринга шаблонов. Страница ограничена MAX_LIMIT строк,
+# поэтому ответ собирается целиком (запросы к БД учитывает QueryBudgetMiddleware)
+def feed_response(request, queryset, fields, date_field="pub_date"):
+    limit = get_limit(request)
+    after = request.GET.get("after")
+    paginator = CursorPaginator(queryset, limit, pk_field=fields["id"], date_field=date_field)
+    rows = paginator.after_queryset(decode_cursor(after) if after else None).values(*fields.values())
+    chunks = []
+    last = next_url = None
+    for index, row in enumerate(rows[:limit + 1].iterator()):
+        if index == limit:
+            next_url = f"?limit={limit}&after={encode_cursor(last, fields['id'], fields[date_field])}"
+            break
+        last = row
+        item = {name: row[field] for name, field in fields.items()}
+        if "image" in item:
+            item["image"] = default_storage.url(item["image"]) if item["image"] else None
+        chunks.append(encoder.encode(item))
+    content = '{"results":[' + ",".join(chunks) + '],"next":' + json.dumps(next_url) + "}"
+    return HttpResponse(content, content_type="application/json")
+
+
+@require_GET
+@versioned_cache_response("posts")
+def index(request):
+    return feed_response(request, Post.objects.all(), POST_FIELDS)
+
+
+@require_GET
+@versioned_cache_response("group:{slug}")
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.filter(group=group), POST_FIELDS)
+
+
+@require_GET
+@versioned_cache_response("author:{username}")
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, Post.objects.filter(author=author), POST_FIELDS)
+
+
+@require_GET
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Требуется авторизация"}, status=401)
+    if timeline.push_mode():
+        entries = TimelineEntry.objects.filter(user=request.user)
+        return feed_response(request, entries, TIMELINE_FIELDS)
+    following = Follow.objects.filter(user=request.user).values_list("author")
+    return feed_response(request, Post.objects.filter(author__in=following), POST_FIELDS)
+
+
+@require_GET
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    return feed_response(request, Comment.objects.filter(post=post), COMMENT_FIELDS, date_field="created")
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import api
+
+# JSON API лент только для чтения (для мобильных клиентов)
+urlpatterns = [
+    path("posts/", api.index, name="api_index"),
+    path("posts/<int:post_id>/comments/", api.post_comments, name="api_post_comments"),
+    path("group/<slug>/", api.group_posts, name="api_group"),
+    path("follow/", api.follow_index, name="api_follow_index"),
+    path("users/<username>/posts/", api.profile, name="api_profile"),
+]
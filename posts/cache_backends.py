@@ -0,0 +1,148 @@
+import itertools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+
+# Кеш в отдельном файле SQLite, общий для всех процессов WSGI-сервера на машине.
+# Не требует внешнего сервиса, в отличие от memcached/redis.
+# Целые числа хранятся как есть, чтобы incr() был атомарным UPDATE,
+# остальные значения - сериализованными через pickle.
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        # Переполнение проверяется не при каждой записи, а раз в CULL_EVERY записей процесса:
+        # COUNT(*) проходит всю таблицу. Между проверками кеш может превысить MAX_ENTRIES
+        # не больше чем на CULL_EVERY записей на процесс
+        self._cull_every = int(params.get("OPTIONS", {}).get("CULL_EVERY", 100))
+        self._writes = itertools.count(1)
+
+    # У каждого потока и процесса (после fork) свое соединение с файлом кеша
+    def _connection(self):
+        if getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if type(value) is int:
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        keys_map = {self._key(key, version): key for key in keys}
+        placeholders = ", ".join("?" * len(keys_map))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)",
+            [*keys_map, time.time()],
+        ).fetchall()
+        return {keys_map[key]: self._load(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version), self._dump(value), expires) for key, value in data.items()]
+        connection = self._connection()
+        connection.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", rows)
+        if next(self._writes) % self._cull_every == 0:
+            self._cull(connection)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, time.time()))
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, self._dump(value), self.get_backend_timeout(timeout)),
+            )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), self._key(key, version), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            cursor = connection.execute(
+                "UPDATE cache SET value = value + ? "
+                "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time()),
+            )
+            if cursor.rowcount == 0:
+                raise ValueError("Key '%s' not found" % key)
+            return connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            placeholders = ", ".join("?" * len(keys))
+            self._connection().execute(f"DELETE FROM cache WHERE key IN ({placeholders})", keys)
+
+    def has_key(self, key, version=None):
+        return bool(self.get_many([key], version=version))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    # Как и в DatabaseCache: при переполнении удаляем просроченные записи,
+    # а если их не хватило - каждую _cull_frequency-ю часть записей
+    # (записи без срока жизни, например версии кеша лент, - в последнюю очередь)
+    def _cull(self, connection):
+        count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        count = connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        connection.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)",
+            (count // self._cull_frequency,),
+        )
@@ -0,0 +1,86 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import feed_cache
+
+logger = logging.getLogger(__name__)
+
+
+# Кеш HTML карточек постов (post_item.html), общий для всех лент и страницы поста.
+# Ключ карточки включает версии трех областей feed_cache: самого поста (изменение поста,
+# комментарии, обработка картинки), его автора и сообщества (posts/signals.py).
+# Части карточки, зависящие от пользователя ({% per_user %}), хранятся метками
+# и подставляются при выдаче страницы
+def post_scope(post_id):
+    return f"card:{post_id}"
+
+
+def author_scope(author_id):
+    return f"card_author:{author_id}"
+
+
+def group_scope(group_id):
+    return f"card_group:{group_id}"
+
+
+def _scopes(post):
+    scopes = [post_scope(post.pk), author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+# Доля карточек, взятых из кеша, с момента запуска процесса
+class CardCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, hits, misses):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+    def reset(self):
+        with self.lock:
+            self.hits = self.misses = 0
+
+    @property
+    def ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+stats = CardCacheStats()
+
+
+# Ключи карточек и найденные в кеше карточки: версии всех областей страницы
+# и сами карточки читаются двумя обращениями к кешу (get_many)
+def get_many(posts):
+    scopes = {post.pk: _scopes(post) for post in posts}
+    names = list({name: None for post_scopes in scopes.values() for name in post_scopes})
+    versions = dict(zip(names, feed_cache.get_versions(names)))
+    keys = {
+        pk: f"post_card:{pk}:" + ":".join(str(versions[name]) for name in post_scopes)
+        for pk, post_scopes in scopes.items()
+    }
+    found = cache.get_many(list(keys.values()))
+    fragments = {pk: found[key] for pk, key in keys.items() if key in found}
+    stats.add(len(fragments), len(keys) - len(fragments))
+    logger.debug("Карточки постов: %d из кеша, %d рендер", len(fragments), len(keys) - len(fragments))
+    return keys, fragments
+
+
+# Карточки, отрендеренные с отстающей реплики вскоре после изменения поста, автора
+# или сообщества, не сохраняются: под новой версией оказались бы устаревшие данные
+def set_many(posts, keys, fragments):
+    scopes = {post.pk: _scopes(post) for post in posts if post.pk in fragments}
+    lagging = feed_cache.lagging_scopes(list({name: None for post_scopes in scopes.values() for name in post_scopes}))
+    cache.set_many(
+        {keys[pk]: fragments[pk] for pk, post_scopes in scopes.items() if lagging.isdisjoint(post_scopes)},
+        settings.FEED_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,276 @@
+import base64
+import datetime
+import hashlib
+import json
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import condition
+
+from . import replicas
+
+
+# Версионированный кеш страниц лент.
+# Каждая страница зависит от набора "областей" (scope): "posts" - все посты,
+# "group:<slug>" - посты сообщества, "author:<username>" - страница автора.
+# При изменении данных версия области увеличивается (posts/signals.py),
+# поэтому закешированные страницы не устаревают и могут жить долго.
+def _version_key(scope):
+    return f"feed_version:{scope}"
+
+
+# Начальная версия берется от времени, чтобы после вытеснения ключа версии
+# из кеша не вернуть к жизни старые страницы
+def _initial_version():
+    return time.time_ns()
+
+
+# Время последнего изменения области (для заголовка Last-Modified)
+def _modified_key(scope):
+    return f"feed_modified:{scope}"
+
+
+def get_versions(scopes):
+    pending = {}
+    versions = read_versions(scopes, pending)
+    if pending:
+        cache.set_many(pending, None)
+    return versions
+
+
+# Версии областей без записи в кеш. Для областей без версии назначается начальная
+# и запоминается в pending: ключи записываются (save_pending) только после успешного
+# ответа, чтобы запросы к несуществующим сообществам и авторам (404) не оставляли
+# в кеше вечных ключей
+def read_versions(scopes, pending):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = pending.setdefault(key, _initial_version())
+    return [versions[key] for key in keys]
+
+
+# Версии областей и время их последнего изменения одним обращением к кешу.
+# Если время неизвестно (область еще не менялась или ключ вытеснен), считаем, что изменение было сейчас.
+# Недостающие значения, как и в read_versions, только запоминаются в pending
+def read_validators(scopes, pending):
+    version_keys = [_version_key(scope) for scope in scopes]
+    modified_keys = [_modified_key(scope) for scope in scopes]
+    values = cache.get_many(version_keys + modified_keys)
+    now = time.time()
+    for key in version_keys:
+        if key not in values:
+            values[key] = pending.setdefault(key, _initial_version())
+    for key in modified_keys:
+        if key not in values:
+            values[key] = pending.setdefault(key, now)
+    return [values[key] for key in version_keys], max(values[key] for key in modified_keys)
+
+
+# Запись начальных версий после успешного ответа. add не перезаписывает
+# версию, которую за это время успел создать bump()
+def save_pending(pending):
+    for key, value in pending.items():
+        cache.add(key, value, None)
+    pending.clear()
+
+
+# Начальные версии, назначенные за время запроса: общие для всех декораторов,
+# чтобы ETag и ключ страницы в кеше строились от одной и той же версии
+def _pending(request):
+    if not hasattr(request, "_pending_versions"):
+        request._pending_versions = {}
+    return request._pending_versions
+
+
+def bump(*scopes):
+    for scope in set(scopes):
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _initial_version(), None)
+    mark_modified(*scopes)
+
+
+# Время изменения области без смены версии (для кешей, которые сбрасываются удалением ключа)
+def mark_modified(*scopes):
+    now = time.time()
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+# Изменение было меньше REPLICA_STICKY_SECONDS назад, а запрос читает с реплик:
+# реплика может еще не содержать изменения
+def _replica_may_lag(modified):
+    return replicas.reading_replica() and time.time() - modified < settings.REPLICA_STICKY_SECONDS
+
+
+# Области, данные которых этот запрос мог прочитать с реплики устаревшими (posts.replicas).
+# Такие данные отдаются, но не сохраняются в кеш
+def lagging_scopes(scopes):
+    if not replicas.reading_replica():
+        return set()
+    values = cache.get_many([_modified_key(scope) for scope in scopes])
+    return {scope for scope in scopes if _replica_may_lag(values.get(_modified_key(scope), 0))}
+
+
+# Области, которые затрагивает изменение поста или его комментариев
+def post_scopes(author_username, group_slug=None):
+    scopes = ["posts", f"author:{author_username}"]
+    if group_slug:
+        scopes.append(f"group:{group_slug}")
+    return scopes
+
+
+# Части страницы, зависящие от пользователя (меню, ссылка на редактирование,
+# кнопка подписки), выводятся тегом {% per_user %}. При рендере страницы для
+# кеша вместо них вставляется метка, а при выдаче страницы метки заменяются
+# шаблонами, отрендеренными для текущего пользователя.
+PER_USER_MARKER = re.compile(r"<!--per_user:([A-Za-z0-9_=-]+)-->")
+# Шаблоны, которые можно подставить по метке. Метку может написать в тексте поста
+# и пользователь - остальные метки остаются в странице как есть
+PER_USER_TEMPLATES = {"nav.html", "menu.html", "post_actions.html", "follow_button.html"}
+
+
+def per_user_marker(template_name, params):
+    data = json.dumps([template_name, params]).encode()
+    return f"<!--per_user:{base64.urlsafe_b64encode(data).decode()}-->"
+
+
+def render_per_user(template_name, params, request):
+    return render_to_string(template_name, params, request=request)
+
+
+def fill_per_user(content, request):
+    rendered = {}
+
+    def replace(match):
+        # Одинаковые части (например, меню) рендерим один раз
+        if match.group(1) not in rendered:
+            try:
+                template_name, params = json.loads(base64.urlsafe_b64decode(match.group(1)))
+            except (TypeError, ValueError):
+                template_name, params = None, None
+            if isinstance(template_name, str) and template_name in PER_USER_TEMPLATES and isinstance(params, dict):
+                rendered[match.group(1)] = render_per_user(template_name, params, request)
+            else:
+                rendered[match.group(1)] = match.group(0)
+        return rendered[match.group(1)]
+
+    return PER_USER_MARKER.sub(replace, content)
+
+
+def _path_hash(request):
+    return hashlib.md5(iri_to_uri(request.get_full_path()).encode()).hexdigest()
+
+
+# Ключ страницы в кеше: текущие версии областей и адрес страницы
+def _page_key(prefix, scopes, request, kwargs):
+    names = [scope.format(**kwargs) for scope in scopes]
+    versions = read_versions(names, _pending(request))
+    return f"{prefix}:" + ":".join(
+        f"{name}.{version}" for name, version in zip(names, versions)
+    ) + f":{_path_hash(request)}"
+
+
+# Кеш страниц лент, общий для всех пользователей. Ключ включает текущие версии
+# областей и адрес страницы; области задаются шаблонами от аргументов view,
+# например "group:{slug}"
+def versioned_cache_page(*scopes, timeout=None):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            key = _page_key("feed_page", scopes, request, kwargs)
+            content = cache.get(key)
+            if content is not None:
+                return HttpResponse(fill_per_user(content, request))
+
+            request.per_user_deferred = True
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            save_pending(_pending(request))
+            content = response.content.decode(response.charset)
+            if not lagging_scopes([scope.format(**kwargs) for scope in scopes]):
+                cache.set(key, content, timeout or settings.FEED_CACHE_TIMEOUT)
+            response.content = fill_per_user(content, request)
+            return response
+        return wrapper
+    return decorator
+
+
+# Кеш ответов без персональных частей (API): тело ответа хранится вместе
+# с Content-Type и отдается как есть, метки {% per_user %} не заполняются
+def versioned_cache_response(*scopes, timeout=None):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            key = _page_key("feed_response", scopes, request, kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            save_pending(_pending(request))
+            if not lagging_scopes([scope.format(**kwargs) for scope in scopes]):
+                cache.set(key, (response.content, response["Content-Type"]), timeout or settings.FEED_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+# Условный GET (ETag/Last-Modified) для страниц, зависящих от областей кеша.
+# Валидаторы берутся из версий и времени изменения областей (без запросов к постам),
+# extra(request, **kwargs) может добавить к ним данные самой страницы - (строка для ETag, время).
+# Страница содержит персональные части, поэтому ETag включает пользователя.
+# Ответ 304 отдается до рендера страницы и до обращения к кешу страниц
+def conditional_page(*scopes, extra=None):
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, "_page_validators"):
+            names = [scope.format(**kwargs) for scope in scopes]
+            versions, modified = read_validators(names, _pending(request))
+            parts = [str(request.user.pk), _path_hash(request), *map(str, versions)]
+            if extra is not None:
+                extra_etag, extra_modified = extra(request, **kwargs)
+                parts.append(extra_etag)
+                modified = max(modified, extra_modified)
+            request._page_validators = (
+                hashlib.md5(":".join(parts).encode()).hexdigest(),
+                datetime.datetime.fromtimestamp(modified, datetime.timezone.utc),
+            )
+        return request._page_validators
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: validators(request, *args, **kwargs)[1],
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ("Cookie",))
+            if response.status_code in (200, 304):
+                save_pending(_pending(request))
+            # Страницу, которая могла быть собрана с отстающей реплики, браузер не должен
+            # сохранять с валидаторами новой версии - иначе он получал бы 304 на устаревшую копию
+            if response.status_code == 200 and _replica_may_lag(validators(request, *args, **kwargs)[1].timestamp()):
+                del response["ETag"]
+                del response["Last-Modified"]
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,8 @@
 from django import forms
-from .models import Post, Comment
+from django.contrib.auth import get_user_model
+from .models import Post, Comment, Group
+
+User = get_user_model()
 
 # Класс формы новой записи
 class NewPost(forms.ModelForm):
@@ -15,3 +18,23 @@ class CommentForm(forms.ModelForm):
     class Meta():
         model = Comment
         fields = ("text",)
+
+
+# Форма поиска постов: текст запроса и необязательные фильтры по сообществу и автору
+class SearchForm(forms.Form):
+    q = forms.CharField(label="Поиск", max_length=200, widget=forms.TextInput(attrs={"placeholder": "Текст записи"}))
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label="Сообщество", required=False, to_field_name="slug", empty_label="Все сообщества"
+    )
+    author = forms.CharField(
+        label="Автор", max_length=150, required=False, widget=forms.TextInput(attrs={"placeholder": "Автор"})
+    )
+
+    def clean_author(self):
+        username = self.cleaned_data["author"].lstrip("@")
+        if not username:
+            return None
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise forms.ValidationError("Автор не найден")
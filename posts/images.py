@@ -0,0 +1,78 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from . import card_cache, feed_cache, thumbnails
+from .models import Post
+
+# Расширения файлов для форматов сохранения
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+
+def _save_options(image_format):
+    if image_format == "JPEG":
+        return {"quality": settings.IMAGE_QUALITY, "optimize": True, "progressive": True}
+    if image_format == "WEBP":
+        return {"quality": settings.IMAGE_QUALITY, "method": 4}
+    return {"optimize": True}
+
+
+# Перекодирование картинки: поворот по EXIF, уменьшение до IMAGE_MAX_SIZE по большей стороне
+# и сохранение в IMAGE_FORMAT без метаданных. Возвращает (содержимое файла, ширина, высота)
+def normalize_image(file):
+    max_size = settings.IMAGE_MAX_SIZE
+    image_format = settings.IMAGE_FORMAT
+    with Image.open(file) as source:
+        # Для JPEG декодер сразу уменьшает картинку в 2-8 раз, не раскодируя полный размер
+        source.draft("RGB", (max_size, max_size))
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        mode = "RGBA" if has_alpha and image_format != "JPEG" else "RGB"
+        if image.mode != mode:
+            image = image.convert(mode)
+        output = BytesIO()
+        # Без exif= и icc_profile= метаданные в новый файл не попадают
+        image.save(output, image_format, **_save_options(image_format))
+    return output.getvalue(), image.width, image.height
+
+
+# Нормализация картинки поста: новый файл вместо загруженного, размеры в модели,
+# миниатюры для нового файла. Миниатюры создаются до того, как пост переключится
+# на новый файл, и до сброса кеша карточек: запросы никогда не создают их сами.
+# Исходный файл и его миниатюры удаляются
+def normalize(post_id, image_name):
+    with default_storage.open(image_name) as file:
+        content, width, height = normalize_image(file)
+    stem = os.path.splitext(image_name)[0]
+    new_name = default_storage.save(f"{stem}.{EXTENSIONS[settings.IMAGE_FORMAT]}", ContentFile(content))
+    try:
+        thumbnails.generate(new_name)
+        # Пост могли отредактировать или удалить, пока картинка обрабатывалась
+        updated = Post.objects.filter(pk=post_id, image=image_name).update(
+            image=new_name, image_width=width, image_height=height, updated=timezone.now()
+        )
+    except Exception:
+        delete_with_thumbnails(new_name)
+        raise
+    if not updated:
+        delete_with_thumbnails(new_name)
+        return
+    # update() не вызывает сигналы - сбрасываем кеш страниц с этим постом сами
+    post = Post.objects.filter(pk=post_id).values_list("author__username", "group__slug").first()
+    if post is not None:
+        feed_cache.bump(card_cache.post_scope(post_id), *feed_cache.post_scopes(*post))
+    delete_with_thumbnails(image_name)
+
+
+# Нормализуем загруженную картинку поста в пуле фоновых потоков после сохранения поста:
+# ответ на POST не ждет перекодирования, а до его окончания карточка показывается с заглушкой
+def process(post):
+    if post.image:
+        thumbnails.submit(normalize, post.pk, post.image.name)
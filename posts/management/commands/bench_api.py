@@ -0,0 +1,81 @@
+import io
+import json
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+
+from posts.models import Post
+from posts.seeding import Seeder
+
+User = get_user_model()
+
+
+# Сравнение HTML-страниц лент и JSON API (posts/api.py): размер ответа и процессорное время
+# на страницу. Кеш страниц отключен, чтобы каждый раз замерялась сборка ответа.
+# Данные создаются в отдельной тестовой БД, которая удаляется после замера
+class Command(BaseCommand):
+    help = "Бенчмарк JSON API лент в сравнении с HTML-страницами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=5000)
+        parser.add_argument("--comments", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=20, help="запросов на страницу")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache_config = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            with override_settings(CACHES={"default": cache_config}, THUMBNAIL_WORKERS=0):
+                Seeder(prefix="bench", rng=random.Random(options["seed"])).run(
+                    100, 5, options["posts"], options["comments"], 1000
+                )
+                call_command("rebuild_comment_counts", stdout=io.StringIO())
+                report = self.run_benchmark(options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
+
+    def run_benchmark(self, repeat):
+        reader = User.objects.annotate(total=Count("follower")).order_by("-total").first()
+        post = Post.objects.select_related("author", "group").exclude(group=None).order_by("-comment_count").first()
+        author, group = post.author.username, post.group.slug
+        pages = {
+            "index": ("/", "/api/v1/posts/"),
+            "group": (f"/group/{group}/", f"/api/v1/group/{group}/"),
+            "profile": (f"/{author}/", f"/api/v1/users/{author}/posts/"),
+            "follow": ("/follow/", "/api/v1/follow/"),
+            "comments": (f"/{author}/{post.pk}/comments/", f"/api/v1/posts/{post.pk}/comments/"),
+        }
+        client = Client()
+        client.force_login(reader)
+        report = {}
+        for name, urls in pages.items():
+            report[name] = {}
+            for kind, url in zip(("html", "json"), urls):
+                cpu = []
+                for _ in range(repeat):
+                    start = time.process_time()
+                    response = client.get(url)
+                    cpu.append(time.process_time() - start)
+                report[name][kind] = {
+                    "bytes": len(response.content),
+                    "cpu_ms": round(statistics.median(cpu) * 1000, 2),
+                }
+            html, api = report[name]["html"], report[name]["json"]
+            self.stdout.write(
+                f"{name:>8}: HTML {html['bytes']} байт, {html['cpu_ms']} ms CPU; "
+                f"JSON {api['bytes']} байт, {api['cpu_ms']} ms CPU"
+            )
+        return report
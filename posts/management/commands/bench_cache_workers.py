@@ -0,0 +1,88 @@
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+# Запросы одного воркера: случайные страницы главной, как при балансировке
+# нагрузки между процессами. Попадание в кеш - запрос без обращений к БД
+def run_worker(cache_config, requests, pages, seed, results):
+    random.seed(seed)
+    with override_settings(CACHES={"default": cache_config}):
+        client = Client()
+        latencies = []
+        hits = 0
+        for _ in range(requests):
+            path = f"/?page={random.randint(1, pages)}"
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                client.get(path)
+                latencies.append(time.perf_counter() - start)
+            if not queries.captured_queries:
+                hits += 1
+    results.put({"latencies": latencies, "hits": hits})
+
+
+# Сравнение доли попаданий в кеш и времени ответа "/" для N процессов
+# с отдельным кешем в каждом процессе (locmem) и общим кешем (sqlite)
+class Command(BaseCommand):
+    help = "Бенчмарк кеша главной страницы для нескольких процессов-воркеров"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--requests", type=int, default=200, help="запросов на воркер")
+        parser.add_argument("--pages", type=int, default=5, help="страниц главной в выборке")
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context("fork")
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = {
+                "locmem": settings.CACHE_BACKENDS["locmem"],
+                "sqlite": dict(settings.CACHE_BACKENDS["sqlite"], LOCATION=os.path.join(tmp, "cache.sqlite3")),
+            }
+            report = {}
+            for name, cache_config in backends.items():
+                # Соединения с БД не должны наследоваться дочерними процессами
+                connections.close_all()
+                results = context.Queue()
+                workers = [
+                    context.Process(
+                        target=run_worker,
+                        args=(cache_config, options["requests"], options["pages"], seed, results),
+                    )
+                    for seed in range(options["workers"])
+                ]
+                for worker in workers:
+                    worker.start()
+                collected = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+                latencies = sorted(latency for result in collected for latency in result["latencies"])
+                hits = sum(result["hits"] for result in collected)
+                report[name] = {
+                    "workers": options["workers"],
+                    "requests": len(latencies),
+                    "hit_ratio": round(hits / len(latencies), 3),
+                    "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                    "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+                }
+                self.stdout.write(
+                    f"{name:>7}: hit ratio {report[name]['hit_ratio']:.3f}, "
+                    f"p50 {report[name]['p50_ms']} ms, p95 {report[name]['p95_ms']} ms"
+                )
+
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
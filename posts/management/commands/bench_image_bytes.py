@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import re
+import tempfile
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from posts import thumbnails
+from posts.models import Post
+from posts.pagination import POSTS_PER_PAGE
+from posts.seeding import Seeder
+
+IMG_RE = re.compile(r"<img\b[^>]*>", re.S)
+ATTR_RE = re.compile(r'([a-z-]+)="([^"]*)"')
+
+# Экраны: ширина CSS-пикселей и плотность пикселей
+VIEWPORTS = {
+    "phone": (360, 3),
+    "phone-1x": (360, 1),
+    "tablet": (768, 2),
+    "laptop": (1366, 1),
+    "desktop-2x": (1920, 2),
+}
+
+
+# Ширина слота картинки из атрибута sizes="(min-width: Npx) Mpx, Kvw"
+def slot_width(sizes, viewport_width):
+    for condition in sizes.split(","):
+        condition = condition.strip()
+        match = re.match(r"\(min-width: (\d+)px\) (\d+)px", condition)
+        if match:
+            if viewport_width >= int(match.group(1)):
+                return int(match.group(2))
+            continue
+        return viewport_width * int(condition.rstrip("vw")) / 100
+    return viewport_width
+
+
+# Как браузер: наименьший вариант не уже слота с учетом плотности, иначе наибольший
+def choose_variant(img, viewport):
+    if "srcset" not in img:
+        return img["src"]
+    width, density = viewport
+    needed = slot_width(img.get("sizes", "100vw"), width) * density
+    candidates = sorted(
+        (int(descriptor.rstrip("w")), url)
+        for url, descriptor in (item.strip().rsplit(" ", 1) for item in img["srcset"].split(","))
+    )
+    for candidate_width, url in candidates:
+        if candidate_width >= needed:
+            return url
+    return candidates[-1][1]
+
+
+# Объем картинок одной страницы ленты для разных экранов: до (каждому экрану
+# миниатюра 960px, все картинки сразу) и после (вариант из srcset, ленивая загрузка).
+# Данные и картинки создаются во временной БД и временном MEDIA_ROOT
+class Command(BaseCommand):
+    help = "Замер объема картинок страницы ленты с srcset и ленивой загрузкой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=20, help="разных картинок")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache_config = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                CACHES={"default": cache_config}, THUMBNAIL_WORKERS=0, MEDIA_ROOT=media_root
+            ):
+                Seeder(prefix="bench", rng=random.Random(options["seed"])).run(
+                    20, 2, POSTS_PER_PAGE * 2, 0, 0, images=options["images"], image_ratio=1.0
+                )
+                for name in Post.objects.values_list("image", flat=True).distinct():
+                    thumbnails.generate(name)
+                report = self.measure(media_root)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
+
+    def measure(self, media_root):
+        html = Client().get("/").content.decode()
+        imgs = [dict(ATTR_RE.findall(tag)) for tag in IMG_RE.findall(html)]
+
+        def file_size(url):
+            return os.path.getsize(os.path.join(media_root, unquote(url[len(settings.MEDIA_URL):])))
+
+        before = sum(file_size(img["src"]) for img in imgs)
+        report = {"images": len(imgs), "before_bytes": before}
+        self.stdout.write(f"Картинок на странице: {len(imgs)}, до: {before} байт на любом экране")
+        for name, viewport in VIEWPORTS.items():
+            sizes = [file_size(choose_variant(img, viewport)) for img in imgs]
+            initial = sum(size for size, img in zip(sizes, imgs) if img.get("loading") != "lazy")
+            report[name] = {"initial_bytes": initial, "scrolled_bytes": sum(sizes)}
+            self.stdout.write(
+                f"{name:>11}: при открытии {initial} байт ({initial / before:.0%}), "
+                f"после прокрутки всей страницы {sum(sizes)} байт ({sum(sizes) / before:.0%})"
+            )
+        return report
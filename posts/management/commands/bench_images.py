@@ -0,0 +1,89 @@
+import json
+import random
+import statistics
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from posts import thumbnails
+from posts.images import normalize_image
+from posts.seeding import photo
+
+
+# Снимок с EXIF как у телефона (поворот, модель камеры, дата)
+def make_photo(rng, size):
+    image = photo(rng, size)
+    exif = image.getexif()
+    exif[0x0112] = 6
+    exif[0x010F] = "Bench"
+    exif[0x0110] = "Camera 12 Pro"
+    exif[0x0132] = "2020:01:01 12:00:00"
+    output = BytesIO()
+    image.save(output, "JPEG", quality=92, exif=exif.tobytes())
+    return output.getvalue()
+
+
+# Время построения миниатюры карточки из файла (раскодирование + масштабирование)
+def card_thumbnail_time(content):
+    size = tuple(int(side) for side in thumbnails.CARD_THUMBNAIL[0].split("x"))
+    start = time.perf_counter()
+    with Image.open(BytesIO(content)) as image:
+        ImageOps.fit(ImageOps.exif_transpose(image), size, Image.LANCZOS)
+    return time.perf_counter() - start
+
+
+# Экономия места от нормализации картинок (posts.images) и стоимость
+# построения миниатюр из исходного и нормализованного файла
+class Command(BaseCommand):
+    help = "Бенчмарк нормализации загруженных картинок постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10, help="число картинок")
+        parser.add_argument("--width", type=int, default=4032)
+        parser.add_argument("--height", type=int, default=3024)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        size = (options["width"], options["height"])
+        original_bytes, normalized_bytes = [], []
+        normalize_times, original_thumbnail_times, normalized_thumbnail_times = [], [], []
+        for _ in range(options["count"]):
+            original = make_photo(rng, size)
+            start = time.perf_counter()
+            normalized, width, height = normalize_image(BytesIO(original))
+            normalize_times.append(time.perf_counter() - start)
+            original_bytes.append(len(original))
+            normalized_bytes.append(len(normalized))
+            original_thumbnail_times.append(card_thumbnail_time(original))
+            normalized_thumbnail_times.append(card_thumbnail_time(normalized))
+
+        def median_ms(values):
+            return round(statistics.median(values) * 1000, 1)
+
+        report = {
+            "source_size": list(size),
+            "normalized_size": [width, height],
+            "format": settings.IMAGE_FORMAT,
+            "quality": settings.IMAGE_QUALITY,
+            "original_bytes": sum(original_bytes),
+            "normalized_bytes": sum(normalized_bytes),
+            "normalize_ms": median_ms(normalize_times),
+            "thumbnail_original_ms": median_ms(original_thumbnail_times),
+            "thumbnail_normalized_ms": median_ms(normalized_thumbnail_times),
+        }
+        saved = 1 - report["normalized_bytes"] / report["original_bytes"]
+        self.stdout.write(
+            f"Картинок: {options['count']}, {size[0]}x{size[1]} -> {width}x{height} {settings.IMAGE_FORMAT}\n"
+            f"Объем: {report['original_bytes']} -> {report['normalized_bytes']} байт (экономия {saved:.0%})\n"
+            f"Нормализация: {report['normalize_ms']} ms на картинку\n"
+            f"Миниатюра карточки: из исходной {report['thumbnail_original_ms']} ms, "
+            f"из нормализованной {report['thumbnail_normalized_ms']} ms"
+        )
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
@@ -0,0 +1,103 @@
+import json
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template import Context, Engine, engines
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import card_cache
+from posts.models import Post
+from posts.seeding import Seeder
+
+# Страница ленты до и после: карточки через {% include %} в цикле и через {% post_cards %}
+PAGES = {
+    "include.html": '{% for post in posts %}{% include "post_item.html" with post=post urls=post.urls %}{% endfor %}',
+    "post_cards.html": "{% load post_cards %}{% post_cards posts %}",
+}
+
+
+def make_engine(cached):
+    loaders = [
+        ("django.template.loaders.locmem.Loader", PAGES),
+        "django.template.loaders.filesystem.Loader",
+        "django.template.loaders.app_directories.Loader",
+    ]
+    if cached:
+        loaders = [("django.template.loaders.cached.Loader", loaders)]
+    return Engine(
+        dirs=[settings.TEMPLATES_DIR],
+        loaders=loaders,
+        libraries=engines["django"].engine.libraries,
+    )
+
+
+# URL карточки, как их разворачивали теги {% url %} в каждой итерации
+def reverse_each(posts):
+    for post in posts:
+        username = post.author.username
+        post.urls = {
+            "profile": reverse("profile", args=[username]),
+            "group": reverse("group", args=[post.group.slug]) if post.group_id else "",
+            "post": reverse("post", args=[username, post.pk]),
+            "edit": reverse("post_edit", args=[username, post.pk]),
+        }
+
+
+# Время рендера карточек постов для страниц из 10 и 100 постов:
+# {% include %} в цикле с загрузчиками шаблонов без кеша и с кешем, {% post_cards %}
+# без кеша карточек и с ним (posts.card_cache).
+# Персональные части карточек ({% per_user %}) заменяются метками, как при рендере для кеша страниц
+class Command(BaseCommand):
+    help = "Бенчмарк рендера карточек постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100", help="числа постов на странице через запятую")
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            Seeder(prefix="bench", rng=random.Random(options["seed"])).run(20, 5, max(sizes), 0, 0)
+            posts = list(Post.objects.select_related("author", "group")[:max(sizes)])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        request = RequestFactory().get("/")
+        request.per_user_deferred = True
+        no_cache = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench_render"}
+        variants = {
+            "include, без кеша шаблонов": (make_engine(cached=False), "include.html", no_cache),
+            "include, кеш шаблонов": (make_engine(cached=True), "include.html", no_cache),
+            "post_cards, кеш шаблонов": (make_engine(cached=True), "post_cards.html", no_cache),
+            "post_cards, кеш карточек": (make_engine(cached=True), "post_cards.html", locmem),
+        }
+        report = {}
+        for size in sizes:
+            page = posts[:size]
+            report[size] = {}
+            for name, (engine, template_name, cache_config) in variants.items():
+                times = []
+                card_cache.stats.reset()
+                with override_settings(CACHES={"default": cache_config}):
+                    for _ in range(options["repeat"]):
+                        start = time.perf_counter()
+                        if template_name == "include.html":
+                            reverse_each(page)
+                        engine.get_template(template_name).render(Context({"posts": page, "request": request}))
+                        times.append(time.perf_counter() - start)
+                report[size][name] = round(statistics.median(times) * 1000, 2)
+                hits = f", попаданий в кеш карточек {card_cache.stats.ratio:.0%}" if template_name == "post_cards.html" else ""
+                self.stdout.write(f"{size:>4} постов, {name}: {report[size][name]} ms{hits}")
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
@@ -0,0 +1,73 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Post
+from posts.search import SearchResults
+from posts.seeding import Seeder
+from posts.pagination import POSTS_PER_PAGE
+
+
+def first_page(results):
+    results.count()
+    return list(results[:POSTS_PER_PAGE])
+
+
+# Сравнение поиска по индексу FTS5 и поиска подстроки (LIKE, как text__icontains в админке)
+# на растущем числе постов: первая страница результатов вместе с общим количеством.
+# Данные создаются в отдельной тестовой БД, которая удаляется после замера
+class Command(BaseCommand):
+    help = "Бенчмарк полнотекстового поиска постов в сравнении с LIKE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000", help="число постов через запятую")
+        parser.add_argument("--queries", type=int, default=20, help="запросов на каждый размер")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            report = self.run_benchmark(sizes, options["queries"], random.Random(options["seed"]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2)
+
+    def run_benchmark(self, sizes, queries, rng):
+        seeder = Seeder(prefix="bench", rng=rng)
+        users = seeder.users(200)
+        # Слова средней частоты: не стоп-слова, но и не единичные совпадения
+        words = rng.sample(seeder.vocabulary[10:500], queries)
+        report = {}
+        for size in sizes:
+            seeder.posts(size - Post.objects.count(), users, [])
+            methods = {
+                "fts5": lambda word: first_page(SearchResults(word)),
+                "like": lambda word: first_page(
+                    Post.objects.select_related("author", "group").filter(text__icontains=word).order_by("-pub_date")
+                ),
+            }
+            report[size] = {}
+            for name, method in methods.items():
+                latencies = []
+                for word in words:
+                    start = time.perf_counter()
+                    method(word)
+                    latencies.append(time.perf_counter() - start)
+                latencies.sort()
+                report[size][name] = {
+                    "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                    "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2),
+                }
+            self.stdout.write(
+                f"{size:>8} постов: fts5 p50 {report[size]['fts5']['p50_ms']} ms, "
+                f"like p50 {report[size]['like']['p50_ms']} ms"
+            )
+        return report
@@ -0,0 +1,154 @@
+import datetime as dt
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts.models import Post, Group
+from posts.seeding import Seeder
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+    return values[index]
+
+
+# Замер времени ответа всех страниц posts/urls.py и users/urls.py через тестовый клиент.
+# Данные создаются в отдельной тестовой БД, которая удаляется после замера.
+# Каждая страница замеряется с холодным кешем (кеш очищается перед запросом)
+# и с прогретым; результат - p50/p95/p99 и число SQL-запросов в JSON
+class Command(BaseCommand):
+    help = "Бенчмарк времени ответа страниц сайта на сгенерированных данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--groups", type=int, default=5)
+        parser.add_argument("--posts", type=int, default=2000)
+        parser.add_argument("--comments", type=int, default=5000)
+        parser.add_argument("--follows", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=20, help="запросов на страницу в каждом режиме")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--cache", choices=["locmem", "sqlite"], default="sqlite")
+        parser.add_argument("--json", help="файл для результатов в формате JSON")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Кеш сайта не трогаем: страницы тестовой БД в нем не нужны
+        cache_config = settings.CACHE_BACKENDS[options["cache"]]
+        if options["cache"] == "sqlite":
+            tmp = tempfile.TemporaryDirectory()
+            cache_config = dict(cache_config, LOCATION=os.path.join(tmp.name, "cache.sqlite3"))
+        try:
+            with override_settings(CACHES={"default": cache_config}, THUMBNAIL_WORKERS=0):
+                self.seed(options)
+                results = self.run_benchmark(options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if options["cache"] == "sqlite":
+                tmp.cleanup()
+
+        report = {
+            "commit": self.commit(),
+            "date": dt.datetime.now().isoformat(timespec="seconds"),
+            "dataset": {name: options[name] for name in ("users", "groups", "posts", "comments", "follows")},
+            "cache": options["cache"],
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        for name, variants in results.items():
+            for variant, stats in variants.items():
+                self.stdout.write(
+                    f"{name:>28} {variant:>4}: p50 {stats['p50_ms']:7.2f} ms, p95 {stats['p95_ms']:7.2f} ms, "
+                    f"p99 {stats['p99_ms']:7.2f} ms, запросов {stats['queries']}"
+                )
+        if options["json"]:
+            with open(options["json"], "w") as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+
+    def seed(self, options):
+        Seeder(prefix="bench", rng=random.Random(options["seed"])).run(
+            options["users"], options["groups"], options["posts"], options["comments"], options["follows"]
+        )
+        # Счетчики комментариев bulk_create не обновляет
+        call_command("rebuild_comment_counts", stdout=io.StringIO())
+
+    def routes(self):
+        author = User.objects.annotate(total=Count("author_post")).order_by("-total").first()
+        post = Post.objects.filter(author=author).order_by("-comment_count").first()
+        group = post.group or Group.objects.first()
+        other = User.objects.exclude(pk=author.pk).first()
+        post_kwargs = {"username": author.username, "post_id": post.pk}
+        return author, [
+            ("index", "get", reverse("index"), None),
+            ("group", "get", reverse("group", args=[group.slug]), None),
+            ("author_current_group_posts", "get",
+             reverse("author_current_group_posts", args=[group.slug, author.username]), None),
+            ("follow_index", "get", reverse("follow_index"), None),
+            ("profile", "get", reverse("profile", args=[other.username]), None),
+            ("admin_profile", "get", reverse("admin_profile", args=[author.username]), None),
+            ("post", "get", reverse("post", kwargs=post_kwargs), None),
+            ("post_comments", "get", reverse("post_comments", kwargs=post_kwargs), None),
+            ("post_edit", "get", reverse("post_edit", kwargs=post_kwargs), None),
+            ("new_post", "get", reverse("new_post"), None),
+            ("new_post (POST)", "post", reverse("new_post"), {"text": "Новый пост"}),
+            ("add_comment", "post", reverse("add_comment", kwargs=post_kwargs), {"text": "Новый комментарий"}),
+            ("profile_follow", "get", reverse("profile_follow", args=[other.username]), None),
+            ("profile_unfollow", "get", reverse("profile_unfollow", args=[other.username]), None),
+            ("search", "get", reverse("search"), {"q": post.text.split()[0]}),
+            ("signup", "get", reverse("signup"), None),
+        ]
+
+    def run_benchmark(self, repeat):
+        author, routes = self.routes()
+        client = Client()
+        client.force_login(author)
+        results = {}
+        for name, method, url, data in routes:
+            results[name] = {}
+            for variant in ("cold", "warm"):
+                latencies = []
+                queries = []
+                if variant == "warm":
+                    getattr(client, method)(url, data or {})
+                for _ in range(repeat):
+                    if variant == "cold":
+                        cache.clear()
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, data or {})
+                    latencies.append(time.perf_counter() - start)
+                    queries.append(response.query_stats.count)
+                results[name][variant] = {
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                    "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+                    "queries": max(queries),
+                }
+        return results
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+def _normalize(post_id, image_name):
+    try:
+        images.normalize(post_id, image_name)
+        return None
+    except Exception as error:
+        return f"{image_name}: {error}"
+
+
+# Нормализация картинок постов, загруженных до появления posts.images
+# (или не обработанных из-за ошибки фонового потока)
+class Command(BaseCommand):
+    help = "Перекодирует необработанные картинки постов (IMAGE_MAX_SIZE, IMAGE_FORMAT, без метаданных)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=getattr(settings, "THUMBNAIL_WORKERS", 2),
+            help="число потоков, 0 - обрабатывать в основном потоке",
+        )
+
+    def handle(self, *args, **options):
+        pending = list(
+            Post.objects.exclude(image="").exclude(image=None).filter(image_width=None)
+            .values_list("pk", "image").order_by("pk")
+        )
+        if options["workers"] == 0:
+            results = [_normalize(*row) for row in pending]
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                futures = [executor.submit(thumbnails.run_in_thread, _normalize, *row) for row in pending]
+                results = [future.result() for future in futures]
+        errors = [error for error in results if error]
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(f"Обработано картинок: {len(pending) - len(errors)}, ошибок: {len(errors)}"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Post, Comment
+
+
+# Пересчет сохраненных счетчиков комментариев у всех постов
+class Command(BaseCommand):
+    help = "Пересчитывает Post.comment_count по таблице комментариев"
+
+    def handle(self, *args, **options):
+        counts = (
+            Comment.objects.filter(post=OuterRef("pk"))
+            .values("post").annotate(total=Count("pk")).values("total")
+        )
+        with transaction.atomic():
+            updated = Post.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+        self.stdout.write(self.style.SUCCESS(f"Обновлено постов: {updated}"))
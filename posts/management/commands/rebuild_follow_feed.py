@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Follow, TimelineEntry
+from posts import timeline
+
+
+# Полная пересборка материализованных лент подписок (для перехода в режим "push")
+class Command(BaseCommand):
+    help = "Пересобирает ленты подписок TimelineEntry по таблице Follow"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            for follow in Follow.objects.select_related("user", "author").iterator():
+                timeline.backfill(follow.user, follow.author)
+        self.stdout.write(self.style.SUCCESS(f"Записей в лентах: {TimelineEntry.objects.count()}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.search import rebuild_index
+
+
+# Пересборка полнотекстового индекса постов (например, после загрузки дампа в обход триггеров)
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс posts_post_fts по таблице постов"
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM posts_post_fts")
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(f"Постов в индексе: {count}"))
@@ -0,0 +1,73 @@
+import io
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feed_cache, timeline
+from posts.models import Group
+from posts.seeding import Seeder
+from posts.stats import AuthorStats
+
+User = get_user_model()
+
+
+# Заполнение БД синтетическими данными в объеме, сравнимом с продакшеном
+class Command(BaseCommand):
+    help = "Генерирует пользователей, сообщества, посты, комментарии и подписки"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--groups", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=100000)
+        parser.add_argument("--comments", type=int, default=300000)
+        parser.add_argument("--follows", type=int, default=50000)
+        parser.add_argument("--exponent", type=float, default=1.2, help="показатель степенного распределения")
+        parser.add_argument("--days", type=int, default=365, help="за сколько дней распределить посты")
+        parser.add_argument("--images", type=int, default=0, help="число картинок-заглушек в MEDIA_ROOT")
+        parser.add_argument("--image-ratio", type=float, default=0.2, help="доля постов с картинкой")
+        parser.add_argument("--batch-size", type=int, default=1000, help="строк в одном INSERT")
+        parser.add_argument("--chunk-size", type=int, default=20000, help="строк в одной транзакции")
+        parser.add_argument("--prefix", default="seed", help="префикс имен пользователей и сообществ")
+        parser.add_argument("--seed", type=int, help="seed генератора случайных чисел")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if options["users"] < 2:
+            raise CommandError("Нужно хотя бы два пользователя")
+        if (User.objects.filter(username__startswith=prefix).exists()
+                or Group.objects.filter(slug__startswith=f"{prefix}-").exists()):
+            raise CommandError(f"Данные с префиксом '{prefix}' уже есть, укажите другой --prefix")
+
+        seeder = Seeder(
+            prefix=prefix,
+            exponent=options["exponent"],
+            days=options["days"],
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+            rng=random.Random(options["seed"]),
+        )
+        start = time.perf_counter()
+        stats = seeder.run(
+            options["users"], options["groups"], options["posts"], options["comments"], options["follows"],
+            images=options["images"], image_ratio=options["image_ratio"],
+        )
+        # bulk_create не вызывает сигналы: счетчики, ленты подписок и кеш обновляем сами
+        call_command("rebuild_comment_counts", stdout=io.StringIO())
+        if timeline.push_mode():
+            call_command("rebuild_follow_feed", stdout=io.StringIO())
+        # Сбрасываем только затронутые области: общую ленту, ленты новых сообществ и страницы
+        # новых авторов (их могли открыть и закешировать, пока шла вставка)
+        authors = list(User.objects.filter(username__startswith=prefix).values_list("pk", "username"))
+        slugs = Group.objects.filter(slug__startswith=f"{prefix}-").values_list("slug", flat=True)
+        AuthorStats.invalidate(*[pk for pk, username in authors])
+        feed_cache.bump(
+            "posts", *[f"group:{slug}" for slug in slugs], *[f"author:{username}" for pk, username in authors]
+        )
+
+        for name, result in stats.items():
+            rate = result["rows"] / result["seconds"] if result["seconds"] else 0
+            self.stdout.write(f"{name:>8}: {result['rows']} строк за {result['seconds']:.2f} с ({rate:.0f} строк/с)")
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - start:.2f} с"))
@@ -0,0 +1,62 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger("posts.queries")
+
+
+# Статистика SQL-запросов одного запроса к сайту
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_duration = 0.0
+        self.slowest_sql = None
+
+    # Обертка выполнения запросов (connection.execute_wrapper)
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration >= self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+
+# Считает запросы к БД, их общее время и самый медленный запрос для каждой
+# страницы и сравнивает количество запросов с бюджетом из settings.QUERY_BUDGETS
+# по имени URL и методу запроса (HEAD считается как GET).
+# Статистика доступна в response.query_stats, в режиме DEBUG - еще и в заголовках ответа
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        method = "GET" if request.method == "HEAD" else request.method
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get((url_name, method))
+        response.query_stats = stats
+        if settings.DEBUG:
+            response["X-DB-Queries"] = stats.count
+            response["X-DB-Time-Ms"] = f"{stats.duration * 1000:.1f}"
+            response["X-DB-Slowest-Ms"] = f"{stats.slowest_duration * 1000:.1f}"
+        logger.debug(
+            "%s %s: %d запросов, %.1f мс, самый медленный %.1f мс: %s",
+            method, url_name, stats.count, stats.duration * 1000, stats.slowest_duration * 1000, stats.slowest_sql,
+        )
+        if budget is not None and stats.count > budget:
+            logger.warning("%s %s: %d запросов при бюджете %d", method, url_name, stats.count, budget)
+        return response
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_pub_date(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Post.objects.update(updated=F('pub_date'))
+
+
+# SQLite добавляет поле пересозданием таблицы posts_post, при этом удаляются
+# триггеры полнотекстового индекса (миграция 0013). Их создает заново
+# обработчик post_migrate (posts.search.ensure_triggers)
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='date updated'),
+            preserve_default=False,
+        ),
+        # Для существующих постов время изменения - время публикации
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+    ]
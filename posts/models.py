@@ -20,9 +20,24 @@ class Group(models.Model):
 class Post(models.Model):           
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    # Время последнего сохранения (для заголовков Last-Modified/ETag страницы поста)
+    updated = models.DateTimeField("date updated", auto_now=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="author_post")
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name="group_posts", blank=True, null=True)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Размеры картинки после нормализации (posts.images), пока картинка не обработана - пусто
+    image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    image_height = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    # Счетчик комментариев, обновляется сигналами Comment (posts/signals.py)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        # Индексы под ленты: все посты, посты сообщества и посты автора по дате
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_pub_date_idx"),
+            models.Index(fields=["group", "-pub_date", "-id"], name="post_group_pub_date_idx"),
+            models.Index(fields=["author", "-pub_date", "-id"], name="post_author_pub_date_idx"),
+        ]
 
     def __str__(self):
        # выводим текст поста 
@@ -35,7 +50,36 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField("date published", auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "-created"], name="comment_post_created_idx"),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="follower")
-    author = models.ForeignKey( User, on_delete=models.CASCADE, related_name="following")
\ No newline at end of file
+    author = models.ForeignKey( User, on_delete=models.CASCADE, related_name="following")
+
+    class Meta:
+        # Подписка на автора может быть только одна
+        constraints = [
+            models.UniqueConstraint(fields=["user", "author"], name="unique_follow"),
+        ]
+
+
+# Запись материализованной ленты подписок (режим FOLLOW_FEED_MODE = "push")
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    # Автор и дата публикации копируются из поста для чтения ленты одним индексом
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-pub_date", "-post"], name="timeline_user_pub_date_idx"),
+            models.Index(fields=["user", "author"], name="timeline_user_author_idx"),
+        ]
@@ -0,0 +1,154 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+# Количество постов на странице ленты
+POSTS_PER_PAGE = 10
+
+# Количество комментариев, загружаемых за раз на странице поста
+COMMENTS_PER_PAGE = 20
+
+
+# Курсор - непрозрачный токен с ключом сортировки (pub_date, id) поста.
+# pk_field - атрибут с id поста, если лента строится не по самим постам,
+# date_field - поле даты для других моделей (например, created у комментариев).
+# Вместо объекта можно передать словарь строки из .values()
+def encode_cursor(post, pk_field="pk", date_field="pub_date"):
+    if isinstance(post, dict):
+        date, pk = post[date_field], post[pk_field]
+    else:
+        date, pk = getattr(post, date_field), getattr(post, pk_field)
+    raw = f"{date.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        pub_date, pk = raw.split("|")
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+# Страница курсорной пагинации
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous, pk_field="pk", date_field="pub_date"):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list:
+            if has_next:
+                self.next_cursor = encode_cursor(object_list[-1], pk_field, date_field)
+            if has_previous:
+                self.previous_cursor = encode_cursor(object_list[0], pk_field, date_field)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+
+# Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET:
+# стоимость любой страницы одинакова, независимо от ее "глубины"
+class CursorPaginator:
+    def __init__(self, object_list, per_page, pk_field="pk", date_field="pub_date"):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.pk_field = pk_field
+        self.date_field = date_field
+
+    # Строки после курсора (или с начала ленты) в порядке ленты, без ограничения количества
+    def after_queryset(self, after=None):
+        pk_field, date_field = self.pk_field, self.date_field
+        object_list = self.object_list.order_by(f"-{date_field}", f"-{pk_field}")
+        if after is not None:
+            date, pk = after
+            object_list = object_list.filter(
+                Q(**{f"{date_field}__lt": date}) | Q(**{date_field: date, f"{pk_field}__lt": pk})
+            )
+        return object_list
+
+    def get_page(self, after=None, before=None):
+        pk_field, date_field = self.pk_field, self.date_field
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None:
+            date, pk = before
+            rows = list(
+                self.object_list
+                .filter(Q(**{f"{date_field}__gt": date}) | Q(**{date_field: date, f"{pk_field}__gt": pk}))
+                .order_by(date_field, pk_field)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return CursorPage(rows, True, has_previous, pk_field, date_field)
+
+        rows = list(self.after_queryset(after)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], has_next, after is not None, pk_field, date_field)
+
+
+# Номера страниц ленты (?page=N) принимаются только для первых страниц:
+# дальше OFFSET становится дорогим, и лента листается по курсору
+MAX_PAGE_NUMBER = 5
+
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get("page", 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+# Пагинация ленты: по курсору (?after= / ?before=), либо по номеру страницы (?page=N)
+# до MAX_PAGE_NUMBER для совместимости со старыми ссылками (дальше - 404).
+# Страница по номеру читается одним запросом LIMIT per_page + 1 без COUNT(*):
+# Paginator и Page - обычные, но число постов в Paginator известно только до следующей страницы
+def paginate_feed(request, post_list, pk_field="pk"):
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    if after or before:
+        paginator = CursorPaginator(post_list, POSTS_PER_PAGE, pk_field=pk_field)
+        return paginator.get_page(after=after, before=before), paginator
+
+    number = _page_number(request)
+    if number > MAX_PAGE_NUMBER:
+        raise Http404("Страницы дальше листаются по курсору")
+    offset = (number - 1) * POSTS_PER_PAGE
+    cursor_paginator = CursorPaginator(post_list, POSTS_PER_PAGE, pk_field=pk_field)
+    rows = list(cursor_paginator.after_queryset()[offset:offset + POSTS_PER_PAGE + 1])
+    if not rows and number > 1:
+        raise Http404("Страница пуста")
+    paginator = Paginator(cursor_paginator.after_queryset(), POSTS_PER_PAGE)
+    paginator.count = offset + len(rows)
+    page = Page(rows[:POSTS_PER_PAGE], number, paginator)
+    # Переход дальше по ленте ведем уже по курсору
+    if page.has_next():
+        page.next_cursor = encode_cursor(page[len(page) - 1], pk_field)
+    return page, paginator
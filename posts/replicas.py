@@ -0,0 +1,87 @@
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Чтение с реплик БД (settings.DATABASE_REPLICAS), запись - всегда в основную БД.
+# С реплик читают только запросы GET/HEAD (ленты, профили, страницы постов, flatpages),
+# и только пока в запросе не было записи. Вне запросов (команды, фоновые потоки) все идет
+# в основную БД. После записи клиент получает cookie и следующие REPLICA_STICKY_SECONDS
+# секунд читает из основной БД - видит свои изменения, даже если реплики отстают.
+# Данные, прочитанные с реплики в эти секунды после изменения, могут быть устаревшими,
+# поэтому кеши с версиями областей (posts.feed_cache) их не сохраняют: иначе устаревшая
+# страница жила бы в кеше под новой версией до следующего изменения
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+STICKY_COOKIE = "use_primary_db"
+
+_state = threading.local()
+
+
+def _replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+# Остаток запроса читает из основной БД
+def use_primary():
+    _state.read_replica = False
+
+
+# Запрос сейчас читает с реплик
+def reading_replica():
+    return bool(_replicas()) and getattr(_state, "read_replica", False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = _replicas()
+        if replicas and getattr(_state, "read_replica", False):
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    # Запись (в том числе посреди GET-запроса: сессия, last_login, подписка) - дальше
+    # запрос читает свои изменения, а клиент получает cookie привязки к основной БД
+    def db_for_write(self, model, **hints):
+        use_primary()
+        _state.sticky = True
+        return DEFAULT_DB_ALIAS
+
+    # Реплики - копии основной БД, объекты из них можно связывать между собой
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+# Выбор БД для запроса: чтение с реплик для безопасных методов без cookie привязки.
+# Ответ на запрос, в котором была запись, ставит cookie привязки к основной БД
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.read_replica = request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+        _state.sticky = False
+        try:
+            response = self.get_response(request)
+        finally:
+            sticky = _state.sticky
+            _state.read_replica = _state.sticky = False
+        if sticky and _replicas():
+            response.set_cookie(
+                STICKY_COOKIE, "1", max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+# View, которая пишет в БД (в том числе на GET, как подписка): весь запрос читает из основной БД,
+# чтобы проверки перед записью не опирались на отстающую реплику. Cookie привязки ставит
+# только сама запись - открытие формы (GET new_post, post_edit) клиента не привязывает
+def primary_db(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        use_primary()
+        return view(request, *args, **kwargs)
+    return wrapper
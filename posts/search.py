@@ -0,0 +1,134 @@
+import re
+
+from django.db import connection, connections
+
+from .models import Post
+
+
+# Слова запроса: буквы и цифры, операторы и кавычки FTS5 из ввода пользователя отбрасываем
+WORD_RE = re.compile(r"\w+")
+
+
+# Запрос пользователя в синтаксисе FTS5: каждое слово в кавычках и с поиском по префиксу
+# ("поис"* найдет "поиск" и "поиска"), все слова должны встретиться в посте
+def match_expression(query):
+    return " ".join(f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+
+# Результаты поиска по индексу posts_post_fts (миграция 0013), по убыванию релевантности (bm25).
+# Поддерживает count() и срезы, поэтому подходит для стандартного Paginator:
+# на страницу - COUNT и LIMIT/OFFSET по индексу и один запрос за самими постами
+class SearchResults:
+    def __init__(self, query, group=None, author=None):
+        self.match = match_expression(query)
+        self.conditions = ["posts_post_fts MATCH %s"]
+        self.params = [self.match]
+        if group is not None:
+            self.conditions.append("posts_post.group_id = %s")
+            self.params.append(group.pk)
+        if author is not None:
+            self.conditions.append("posts_post.author_id = %s")
+            self.params.append(author.pk)
+        self._count = None
+
+    def _execute(self, select, tail="", params=()):
+        # Таблица постов нужна только для фильтров
+        join = "JOIN posts_post ON posts_post.id = posts_post_fts.rowid " if len(self.conditions) > 1 else ""
+        sql = f"SELECT {select} FROM posts_post_fts {join}WHERE {' AND '.join(self.conditions)} {tail}"
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*self.params, *params])
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._execute("COUNT(*)")[0][0] if self.match else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.match or stop <= start:
+            return []
+        rows = self._execute(
+            "posts_post_fts.rowid", "ORDER BY posts_post_fts.rank, posts_post_fts.rowid DESC LIMIT %s OFFSET %s",
+            [stop - start, start],
+        )
+        ids = [row[0] for row in rows]
+        posts = Post.objects.select_related("author", "group").in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+# Поиск постов: индекс FTS5 есть только в SQLite, в других БД - поиск подстроки
+def search_posts(query, group=None, author=None):
+    if connection.vendor == "sqlite":
+        return SearchResults(query, group, author)
+    post_list = Post.objects.select_related("author", "group").filter(text__icontains=query)
+    if group is not None:
+        post_list = post_list.filter(group=group)
+    if author is not None:
+        post_list = post_list.filter(author=author)
+    return post_list.order_by("-pub_date", "-pk")
+
+
+# Фильтр QuerySet постов по индексу (например, для поиска в админке)
+def filter_posts(queryset, query):
+    if connection.vendor != "sqlite":
+        return queryset.filter(text__icontains=query)
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+    # RawSQL в pk__in Django оборачивает в лишние скобки (скалярный подзапрос), поэтому extra()
+    return queryset.extra(
+        where=["posts_post.id IN (SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s)"], params=[match]
+    )
+
+
+# Полная пересборка индекса по таблице постов
+def rebuild_index():
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')")
+
+
+# Триггеры, поддерживающие индекс (те же, что создает миграция 0013)
+TRIGGERS = {
+    "posts_post_fts_insert": """
+        CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+            INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    "posts_post_fts_delete": """
+        CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+    """,
+    "posts_post_fts_update": """
+        CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+}
+
+
+# SQLite меняет схему таблицы пересозданием (миграции 0014, 0015 и следующие, в том числе
+# при откате), при этом триггеры индекса удаляются. После миграций (сигнал post_migrate)
+# создаем недостающие триггеры и пересобираем индекс - миграции триггеры не восстанавливают
+def ensure_triggers(using="default", **kwargs):
+    db = connections[using]
+    if db.vendor != "sqlite":
+        return
+    with db.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'posts_post_fts'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'posts_post'")
+        missing = set(TRIGGERS) - {row[0] for row in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            cursor.execute("INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')")
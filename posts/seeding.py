@@ -0,0 +1,183 @@
+import itertools
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import thumbnails
+from .models import Post, Group, Comment, Follow
+
+User = get_user_model()
+
+# Слоги для псевдослов текста постов
+SYLLABLES = "ба ве ги до жу за ки ло му на по ре си ту фа хо це чи шу ям ор ин ус эк".split()
+
+
+# Накопленные веса распределения Ципфа: i-й по популярности получает вес 1 / i^exponent.
+# Накопленные веса позволяют random.choices выбирать бинарным поиском
+def zipf_cum_weights(count, exponent):
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+# Похожая на фотографию картинка: плавные цветовые пятна и шум матрицы.
+# Заливка одним цветом сжимается в разы лучше настоящих снимков и искажает замеры объема
+def photo(rng, size):
+    blobs = Image.frombytes("RGB", (16, 12), bytes(rng.randrange(256) for _ in range(16 * 12 * 3)))
+    grain = Image.effect_noise(size, 12).convert("RGB")
+    return Image.blend(blobs.resize(size, Image.BICUBIC), grain, 0.15)
+
+
+# Даты создания и изменения (auto_now_add, auto_now) задаем сами, иначе все строки получат текущее время
+@contextmanager
+def explicit_dates(*fields):
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# Генератор синтетических данных с перекосом, как на реальном сайте:
+# число постов и подписчиков у авторов распределено по степенному закону.
+# Строки пишутся bulk_create пачками по batch_size, по транзакции на chunk_size строк.
+# В stats собирается число строк и время вставки по каждой модели
+class Seeder:
+    def __init__(self, prefix="seed", exponent=1.2, days=365, batch_size=1000, chunk_size=20000, rng=None):
+        self.prefix = prefix
+        self.exponent = exponent
+        self.days = days
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.rng = rng or random.Random()
+        self.now = timezone.now()
+        self.stats = {}
+        # Словарь псевдослов; частота слов в текстах тоже по закону Ципфа
+        self.vocabulary = sorted({
+            "".join(self.rng.choices(SYLLABLES, k=self.rng.randint(2, 4))) for _ in range(5000)
+        })
+        self.rng.shuffle(self.vocabulary)
+        self.vocabulary_weights = zipf_cum_weights(len(self.vocabulary), 1.0)
+
+    def text(self, words):
+        return " ".join(self.rng.choices(self.vocabulary, cum_weights=self.vocabulary_weights, k=words))
+
+    def _insert(self, model, objects, ignore_conflicts=False):
+        start = time.perf_counter()
+        rows = 0
+        while True:
+            chunk = list(itertools.islice(objects, self.chunk_size))
+            if not chunk:
+                break
+            # SQLite ограничивает число параметров в одном запросе
+            batch_size = min(self.batch_size, connection.ops.bulk_batch_size(model._meta.concrete_fields, chunk))
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=batch_size, ignore_conflicts=ignore_conflicts)
+            rows += len(chunk)
+        self.stats[model.__name__] = {"rows": rows, "seconds": time.perf_counter() - start}
+
+    def users(self, count):
+        # Пароль не нужен: один неиспользуемый хеш на всех вместо count вызовов PBKDF2
+        password = make_password(None)
+        self._insert(User, (User(username=f"{self.prefix}{i}", password=password) for i in range(count)))
+        # Порядок пользователей - их ранг популярности
+        return list(
+            User.objects.filter(username__startswith=self.prefix).order_by("pk").values_list("pk", flat=True)
+        )
+
+    def groups(self, count):
+        self._insert(Group, (
+            Group(title=f"Сообщество {self.prefix}-{i}", slug=f"{self.prefix}-{i}", description="Описание")
+            for i in range(count)
+        ))
+        return list(Group.objects.filter(slug__startswith=f"{self.prefix}-").values_list("pk", flat=True))
+
+    # Несколько разных картинок-заглушек в MEDIA_ROOT, общих для всех постов.
+    # Посты вставляются без сигналов, поэтому миниатюры создаем здесь же
+    def images(self, count, size=(960, 540)):
+        start = time.perf_counter()
+        names = []
+        for i in range(count):
+            image = photo(self.rng, size)
+            ImageDraw.Draw(image).text((20, 20), f"{self.prefix} {i}", fill=(255, 255, 255))
+            content = BytesIO()
+            image.save(content, "JPEG", quality=80)
+            names.append(default_storage.save(f"posts/{self.prefix}-{i}.jpg", ContentFile(content.getvalue())))
+            thumbnails.generate(names[-1])
+        self.stats["Image"] = {"rows": count, "seconds": time.perf_counter() - start}
+        return names
+
+    def posts(self, count, users, groups, images=(), image_ratio=0.0):
+        last_pk = Post.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        authors = self.rng.choices(users, cum_weights=zipf_cum_weights(len(users), self.exponent), k=count)
+        groups = list(groups) + [None]
+        seconds = self.days * 24 * 3600
+
+        def generate():
+            for author_id in authors:
+                image = self.rng.choice(images) if images and self.rng.random() < image_ratio else None
+                pub_date = self.now - timedelta(seconds=self.rng.uniform(0, seconds))
+                yield Post(
+                    text=self.text(self.rng.randint(5, 60)),
+                    author_id=author_id,
+                    group_id=self.rng.choice(groups),
+                    image=image,
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        with explicit_dates(Post._meta.get_field("pub_date"), Post._meta.get_field("updated")):
+            self._insert(Post, generate())
+        return list(Post.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "pub_date"))
+
+    # Комментарии тоже скошены: большая часть приходится на небольшую долю постов
+    def comments(self, count, users, posts):
+        posts = list(posts)
+        self.rng.shuffle(posts)
+        targets = self.rng.choices(posts, cum_weights=zipf_cum_weights(len(posts), self.exponent), k=count)
+
+        def generate():
+            for post_id, pub_date in targets:
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(users),
+                    text=self.text(self.rng.randint(3, 20)),
+                    created=pub_date + (self.now - pub_date) * self.rng.random(),
+                )
+
+        with explicit_dates(Comment._meta.get_field("created")):
+            self._insert(Comment, generate())
+
+    # Подписчики по тому же рангу, что и посты: у самых активных авторов больше всего подписчиков
+    def follows(self, count, users):
+        cum_weights = zipf_cum_weights(len(users), self.exponent)
+
+        def generate():
+            for author_id in self.rng.choices(users, cum_weights=cum_weights, k=count):
+                user_id = self.rng.choice(users)
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        # Повторные пары отбрасывает ограничение unique_follow
+        self._insert(Follow, generate(), ignore_conflicts=True)
+
+    def run(self, users, groups, posts, comments, follows, images=0, image_ratio=0.0):
+        user_ids = self.users(users)
+        group_ids = self.groups(groups)
+        image_names = self.images(images) if images and image_ratio else []
+        post_rows = self.posts(posts, user_ids, group_ids, image_names, image_ratio)
+        if post_rows:
+            self.comments(comments, user_ids, post_rows)
+        self.follows(follows, user_ids)
+        return self.stats
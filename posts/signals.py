@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import card_cache, feed_cache, images
+from .models import Post, Group, Comment, Follow
+from .stats import AuthorStats
+
+User = get_user_model()
+
+
+# Атомарно увеличиваем счетчик комментариев поста
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F("comment_count") + 1)
+
+
+# Атомарно уменьшаем счетчик комментариев поста
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(comment_count=F("comment_count") - 1)
+
+
+# Комментарий меняет счетчик в карточке поста - сбрасываем карточку и кеш лент с этим постом
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values_list("author__username", "group__slug").first()
+    if post is not None:
+        feed_cache.bump(card_cache.post_scope(instance.post_id), *feed_cache.post_scopes(*post))
+
+
+# Запоминаем сообщество поста до редактирования, чтобы сбросить и его страницу,
+# и картинку - чтобы обработать новую
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    instance._previous_group_slug = instance._previous_image = None
+    if instance.pk:
+        instance._previous_group_slug, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list("group__slug", "image").first() or (None, None)
+        )
+
+
+# Новую картинку поста обрабатываем при любом сохранении - из формы сайта, админки или shell
+@receiver(post_save, sender=Post)
+def post_image_changed(sender, instance, **kwargs):
+    if instance.image and instance.image.name != getattr(instance, "_previous_image", None):
+        images.process(instance)
+
+
+# Сбрасываем статистику автора, карточку поста и кеш лент при изменении его постов
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    AuthorStats.invalidate(instance.author_id)
+    scopes = feed_cache.post_scopes(instance.author.username, instance.group.slug if instance.group_id else None)
+    scopes.append(card_cache.post_scope(instance.pk))
+    previous_group_slug = getattr(instance, "_previous_group_slug", None)
+    if previous_group_slug:
+        scopes.append(f"group:{previous_group_slug}")
+    feed_cache.bump(*scopes)
+
+
+# Сбрасываем статистику и кеш страниц авторов, у которых есть посты в измененной группе,
+# и карточки постов группы (в них название группы)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    authors = Post.objects.filter(group=instance).order_by().values_list("author", "author__username").distinct()
+    AuthorStats.invalidate(*[author_id for author_id, username in authors])
+    feed_cache.bump(
+        "posts", f"group:{instance.slug}", card_cache.group_scope(instance.pk),
+        *[f"author:{username}" for author_id, username in authors],
+    )
+
+
+# Подписка меняет счетчики и подписчика, и автора
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    AuthorStats.invalidate(instance.user_id, instance.author_id)
+    usernames = User.objects.filter(pk__in=[instance.user_id, instance.author_id]).values_list("username", flat=True)
+    feed_cache.bump(*[f"author:{username}" for username in usernames])
+
+
+# Страница автора и карточки его постов выводят его имя: сбрасываем их при изменении пользователя
+# (кроме обновления даты последнего входа)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    AuthorStats.invalidate(instance.pk)
+    feed_cache.bump(f"author:{instance.username}", card_cache.author_scope(instance.pk))
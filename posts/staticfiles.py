@@ -0,0 +1,126 @@
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость, без нее создаются только .gz
+    brotli = None
+
+# Файлы, которые имеет смысл сжимать (картинки и woff2 уже сжаты)
+COMPRESSIBLE = (".css", ".js", ".map", ".svg", ".json", ".txt", ".xml", ".html", ".ico", ".ttf", ".eot")
+# Выигрыш от сжатия маленьких файлов меньше накладных расходов
+MIN_COMPRESS_SIZE = 256
+
+# Сжатые копии в порядке предпочтения: (суффикс файла, Content-Encoding)
+ENCODINGS = [(".br", "br"), (".gz", "gzip")]
+
+# Имя с хешем содержимого, которое дает ManifestStaticFilesStorage: bootstrap.min.0123456789ab.css
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+
+# Файл с хешем в имени не меняется никогда - браузер не перезапрашивает его,
+# остальные файлы проверяются по Last-Modified
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+# Рядом с файлом пишутся file.gz и file.br (если установлен brotli),
+# чтобы не сжимать статику при каждом запросе
+def compress(path):
+    if not path.endswith(COMPRESSIBLE):
+        return
+    with open(path, "rb") as source:
+        content = source.read()
+    if len(content) < MIN_COMPRESS_SIZE:
+        return
+    with open(f"{path}.gz", "wb") as output:
+        # mtime=0 - одинаковое содержимое дает одинаковый архив
+        with gzip.GzipFile(fileobj=output, mode="wb", compresslevel=9, mtime=0) as archive:
+            archive.write(content)
+    if brotli is not None:
+        with open(f"{path}.br", "wb") as output:
+            output.write(brotli.compress(content, quality=11))
+
+
+# collectstatic записывает в STATIC_ROOT файлы с хешем содержимого в имени, манифест
+# staticfiles.json и их сжатые копии. {% static %} берет имена с хешем из манифеста
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Файла нет в манифесте (например, collectstatic не запускался) - ссылка на имя без хеша
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            compress(self.path(name))
+
+
+# Кодировки из Accept-Encoding, кроме явно запрещенных (q=0)
+def _accepted_encodings(request):
+    encodings = set()
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = item.partition(";")
+        quality = params.strip().lower()
+        try:
+            if quality.startswith("q=") and float(quality[2:]) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+# Маршрут для serve подключается только для собранной статики (collectstatic) при DEBUG = False:
+# только тогда шаблоны ссылаются на имена с хешем. При DEBUG = True статику отдает runserver
+def serving_enabled():
+    return settings.SERVE_STATIC and not settings.DEBUG
+
+
+# Отдача статики из STATIC_ROOT: сжатая копия, если клиент ее принимает,
+# и кеширование в браузере навсегда для файлов с хешем в имени
+def serve(request, path):
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = _accepted_encodings(request)
+    served, content_encoding = fullpath, None
+    for suffix, coding in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            served, content_encoding = fullpath + suffix, coding
+            break
+    stat = os.stat(served)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(open(served, "rb"), content_type=content_type or "application/octet-stream")
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if content_encoding:
+            response["Content-Encoding"] = content_encoding
+    response["Vary"] = "Accept-Encoding"
+    if HASHED_NAME_RE.search(path):
+        response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    return response
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import IntegerField, OuterRef, Subquery
+
+from . import feed_cache
+from .models import Post, Follow
+
+User = get_user_model()
+
+
+# Число строк queryset подзапросом (SELECT COUNT(*) FROM (...)): несколько счетчиков
+# считаются в одном запросе, каждый - по своему индексу
+class SubqueryCount(Subquery):
+    template = "(SELECT COUNT(*) FROM (%(subquery)s) _count)"
+    output_field = IntegerField()
+
+    def __init__(self, queryset, **extra):
+        super().__init__(queryset.order_by().values("pk"), **extra)
+
+
+# Статистика автора для боковой панели профиля: число записей,
+# подписчиков, подписок и список групп. Хранится в кеше и сбрасывается
+# сигналами при изменении постов и подписок (posts/signals.py).
+# Статистика, посчитанная с отстающей реплики сразу после сброса, в кеш не попадает
+class AuthorStats:
+    timeout = 60 * 60
+
+    def __init__(self, author):
+        self.author = author
+
+    @staticmethod
+    def key(author_id):
+        return f"author_stats:{author_id}"
+
+    @classmethod
+    def invalidate(cls, *author_ids):
+        cache.delete_many([cls.key(author_id) for author_id in author_ids])
+        feed_cache.mark_modified(*[cls.key(author_id) for author_id in author_ids])
+
+    def get(self):
+        key = self.key(self.author.pk)
+        stats = cache.get(key)
+        if stats is None:
+            stats = self.compute()
+            if not feed_cache.lagging_scopes([key]):
+                cache.set(key, stats, self.timeout)
+        return stats
+
+    def compute(self):
+        post_list = Post.objects.filter(author=self.author)
+        # Счетчики - одним запросом
+        stats = User.objects.filter(pk=self.author.pk).values(
+            number_of_records=SubqueryCount(Post.objects.filter(author=OuterRef("pk"))),
+            subscribe=SubqueryCount(Follow.objects.filter(author=OuterRef("pk"))),
+            subscribers=SubqueryCount(Follow.objects.filter(user=OuterRef("pk"))),
+        ).get()
+        # Сортировку сбрасываем, иначе distinct() учитывает и ее поля
+        stats["group_list"] = list(post_list.order_by().values_list("group__title", "group__slug").distinct())
+        return stats
@@ -0,0 +1,26 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.feed_cache import per_user_marker, render_per_user
+from posts.models import Follow
+
+register = template.Library()
+
+
+# Часть страницы, которая зависит от пользователя. Для общего кеша страницы
+# и кеша карточек постов (per_user_deferred в контексте) выводится метка,
+# которую posts.feed_cache заменяет при выдаче страницы.
+# Параметры должны быть простыми значениями (числа, строки)
+@register.simple_tag(takes_context=True)
+def per_user(context, template_name, **params):
+    request = context.get("request")
+    if context.get("per_user_deferred") or getattr(request, "per_user_deferred", False):
+        return mark_safe(per_user_marker(template_name, params))
+    return render_per_user(template_name, params, request)
+
+
+@register.filter
+def is_following(user, author_username):
+    if not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author__username=author_username).exists()
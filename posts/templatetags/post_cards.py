@@ -0,0 +1,96 @@
+import re
+from urllib.parse import quote
+
+from django import template
+from django.urls import reverse
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+
+from posts import card_cache, thumbnails
+from posts.feed_cache import fill_per_user
+
+register = template.Library()
+
+# Значения-заглушки для разворота URL: подходят под конвертеры str и int в posts/urls.py
+STR_PLACEHOLDER = "~{}~"
+INT_PLACEHOLDER = 9000000000
+
+
+# URL карточек поста. Каждый маршрут разворачивается один раз на страницу с заглушками
+# вместо аргументов и делится по заглушкам на части. Для каждого поста на места заглушек
+# подставляются значения (с тем же экранированием, что делает reverse()), поэтому
+# значения, похожие на заглушки (например, username из цифр), ничего не ломают
+class PageUrls:
+    def __init__(self):
+        self.patterns = {}
+
+    # Части URL: строки - текст маршрута, числа - номера аргументов
+    def _pattern(self, name, kinds):
+        if name not in self.patterns:
+            placeholders = [
+                STR_PLACEHOLDER.format(index) if kind is str else str(INT_PLACEHOLDER + index)
+                for index, kind in enumerate(kinds)
+            ]
+            url = reverse(name, args=placeholders)
+            parts = re.split("(" + "|".join(map(re.escape, placeholders)) + ")", url) if placeholders else [url]
+            self.patterns[name] = [placeholders.index(part) if index % 2 else part for index, part in enumerate(parts)]
+        return self.patterns[name]
+
+    def __call__(self, name, *args):
+        values = [
+            str(arg) if isinstance(arg, int) else quote(str(arg), safe=RFC3986_SUBDELIMS + "/~:@")
+            for arg in args
+        ]
+        return "".join(values[part] if isinstance(part, int) else part for part in self._pattern(name, map(type, args)))
+
+    def for_post(self, post):
+        username = post.author.username
+        return {
+            "profile": self("profile", username),
+            "group": self("group", post.group.slug) if post.group_id else "",
+            "post": self("post", username, post.pk),
+            "edit": self("post_edit", username, post.pk),
+        }
+
+
+# Ленивая загрузка картинки (post_item.html). Карточки в кеше общие для любой позиции
+# на странице, поэтому атрибут есть всегда и убирается у первой карточки
+LAZY_LOADING = 'loading="lazy" '
+
+
+# Карточки постов (post_item.html) без {% include %} в цикле: карточки берутся из кеша
+# (posts.card_cache), недостающие рендерятся - шаблон берется один раз, URL и миниатюры
+# получаются один раз на страницу. Персональные части карточек рендерятся метками
+# и заполняются для текущего пользователя, если метки не заполнит кеш страниц
+def render_cards(context, posts):
+    posts = list(posts)
+    keys, fragments = card_cache.get_many(posts)
+    missing = [post for post in posts if post.pk not in fragments]
+    if missing:
+        thumbnails.attach(missing)
+        card = context.template.engine.get_template("post_item.html")
+        urls = PageUrls()
+        rendered = {}
+        for post in missing:
+            with context.push(post=post, urls=urls.for_post(post), per_user_deferred=True):
+                rendered[post.pk] = card.render(context)
+        card_cache.set_many(missing, keys, rendered)
+        fragments.update(rendered)
+    output = [fragments[post.pk] for post in posts]
+    if output:
+        output[0] = output[0].replace(LAZY_LOADING, "", 1)
+    content = "".join(output)
+    request = context.get("request")
+    if not getattr(request, "per_user_deferred", False):
+        content = fill_per_user(content, request)
+    return mark_safe(content)
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    return render_cards(context, posts)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return render_cards(context, [post])
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+# Тесты работают со своим кешем (settings.TEST_CACHES), а не с общим кешем сайта:
+# очистка кеша в тестах и данные тестов не попадают в кеш работающего сайта
+def test_caches():
+    return override_settings(CACHES=settings.TEST_CACHES)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = test_caches()
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)
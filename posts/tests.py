@@ -1,13 +1,41 @@
+from io import BytesIO, StringIO
+import gzip
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
-from .models import Post, Group, Follow
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import Count, F
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from . import card_cache, images, staticfiles, thumbnails, urls as posts_urls
+from .feed_cache import fill_per_user, per_user_marker
+from .cache_backends import SQLiteCache
+from .replicas import STICKY_COOKIE
+from .templatetags.post_cards import PageUrls
+from .models import Post, Group, Follow, Comment, TimelineEntry
+from PIL import Image
+from sorl.thumbnail import default as thumbnail_default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
 
 User = get_user_model()
 
 
 class YatubeTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         # регистрация пользователей
         self.client.post(
@@ -157,19 +185,21 @@ class YatubeTest(TestCase):
         # на главной странице
         response = self.client.get("")
         self.assertContains(response, "Тестовый пост", count=None, status_code=200, msg_prefix='', html=False)
-        # на странице поста
-        post = Post.objects.get(text="Тестовый пост")
-        response = self.client.get(f"/testUser/{post.pk}/")
+        # Повторный запрос главной страницы отдается из кеша,
+        # к БД обращаемся только за сессией и пользователем для персональных частей страницы
+        with self.assertNumQueries(2):
+            response = self.client.get("")
         self.assertContains(response, "Тестовый пост", count=None, status_code=200, msg_prefix='', html=False)
         # Изменение поста
         post = Post.objects.get(text="Тестовый пост")
         self.client.post(f"/testUser/{post.pk}/edit/", {"text": "Новое содержимое поста"})
-        # Проверка изменений на странице поста
-        response = self.client.get(f"/testUser/{post.pk}/")
+        # Изменение поста сбрасывает версию кеша, главная страница сразу показывает изменения
+        response = self.client.get("")
         self.assertContains(response, "Новое содержимое поста", count=None, status_code=200, msg_prefix='', html=False)
-        # Проверка отсутствия изменений на главной странице
+        # Новый комментарий тоже обновляет главную страницу (счетчик комментариев)
+        self.client.post(f"/testUser/{post.pk}/comment/", {"text": "Тестовый комментарий"})
         response = self.client.get("")
-        self.assertNotContains(response, "Новое содержимое поста", status_code=200, msg_prefix='', html=False)
+        self.assertContains(response, "1 комментариев", count=None, status_code=200, msg_prefix='', html=False)
 
 
     # Авторизованный пользователь может подписаться на автора и отписаться от него
@@ -224,3 +254,1007 @@ class YatubeTest(TestCase):
         self.client.post(f"/testUser/{post.pk}/comment/", {"text": "Еще один комментарий"})
         response = self.client.get(f"/testUser/{post.pk}/")
         self.assertNotContains(response, "Еще один комментарий", status_code=200, msg_prefix='', html=False)
+
+
+    # Курсорная пагинация ленты: страницы по ?after= / ?before= без COUNT(*)
+    def testCursorPagination(self):
+        testUser = User.objects.get(username="testUser")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        for i in range(25):
+            Post.objects.create(text=f"Пост номер {i}", author=testUser, group=group)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/group/test_group/")
+        self.assertFalse([query for query in queries.captured_queries if "COUNT(" in query["sql"]])
+        page = response.context["page"]
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.next_cursor)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/group/test_group/?after={page.next_cursor}")
+        page = response.context["page"]
+        self.assertEqual([post.text for post in page], [f"Пост номер {i}" for i in range(14, 4, -1)])
+        self.assertTrue(page.has_previous())
+
+        response = self.client.get(f"/group/test_group/?after={page.next_cursor}")
+        last_page = response.context["page"]
+        self.assertEqual(len(last_page), 5)
+        self.assertFalse(last_page.has_next())
+
+        response = self.client.get(f"/group/test_group/?before={last_page.previous_cursor}")
+        self.assertEqual(list(response.context["page"]), list(page))
+
+        # Старые ссылки по номеру страницы продолжают работать, но только для первых страниц.
+        # Страница по номеру - один запрос постов без COUNT(*), ссылок на все страницы нет
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/group/test_group/?page=2")
+        self.assertEqual(list(response.context["page"]), list(page))
+        self.assertFalse([query for query in queries.captured_queries if "COUNT(" in query["sql"]])
+        self.assertNotContains(response, "page=3")
+        self.assertEqual(self.client.get("/group/test_group/?page=4").status_code, 404)
+        self.assertEqual(self.client.get("/group/test_group/?page=6").status_code, 404)
+
+        # Некорректный курсор - первая страница
+        response = self.client.get("/group/test_group/?after=broken")
+        self.assertEqual(response.context["page"][0].text, "Пост номер 24")
+
+
+
+    # Счетчик комментариев хранится в посте и обновляется при создании и удалении комментария
+    def testCommentCount(self):
+        testUser = User.objects.get(username="testUser")
+        post = Post.objects.create(text="Тестовый пост", author=testUser)
+        self.client.login(username="testUser", password="fjvndyb5248")
+        self.client.post(f"/testUser/{post.pk}/comment/", {"text": "Первый комментарий"})
+        self.client.post(f"/testUser/{post.pk}/comment/", {"text": "Второй комментарий"})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        Comment.objects.filter(text="Первый комментарий").delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        response = self.client.get(f"/testUser/{post.pk}/")
+        self.assertContains(response, "1 комментариев", status_code=200)
+
+        # Команда пересчета восстанавливает рассинхронизированный счетчик
+        Post.objects.filter(pk=post.pk).update(comment_count=10)
+        call_command("rebuild_comment_counts", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+
+    # Запросы лент используют индексы (проверка по плану запроса SQLite)
+    def testFeedQueriesUseIndexes(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        post = Post.objects.create(text="Тестовый пост", author=testUser, group=group)
+        feed = Post.objects.select_related("author", "group").order_by("-pub_date", "-pk")
+        querysets = {
+            "index": feed[:11],
+            "group": feed.filter(group=group)[:11],
+            "profile": feed.filter(author=testUser)[:11],
+            "follow": feed.filter(author__in=Follow.objects.filter(user=testUser2).values("author"))[:11],
+            "comments": Comment.objects.filter(post=post).order_by("-created"),
+            "following": Follow.objects.filter(user=testUser2, author=testUser),
+        }
+        for name, queryset in querysets.items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn("INDEX", plan, f"{name}: {plan}")
+            # Полного просмотра таблиц постов и комментариев быть не должно
+            self.assertIsNone(re.search(r"SCAN (TABLE )?posts_(post|comment)(?! USING)", plan), f"{name}: {plan}")
+
+
+
+    # Лента подписок в режиме "push": заполняется при подписке и публикации, очищается при отписке
+    @override_settings(FOLLOW_FEED_MODE="push")
+    def testFollowIndexPushMode(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        Post.objects.create(text="Старый пост", author=testUser)
+
+        self.client.login(username="testUser2", password="dgfhh586hr")
+        self.client.get("/testUser/follow")
+        self.assertEqual(TimelineEntry.objects.filter(user=testUser2).count(), 1)
+        self.client.logout()
+
+        self.client.login(username="testUser", password="fjvndyb5248")
+        for i in range(12):
+            self.client.post("/new/", {"text": f"Новый пост {i}"})
+        self.client.logout()
+
+        self.client.login(username="testUser2", password="dgfhh586hr")
+        response = self.client.get("/follow/")
+        page = response.context["page"]
+        self.assertEqual([post.text for post in page], [f"Новый пост {i}" for i in range(11, 1, -1)])
+        response = self.client.get(f"/follow/?after={page.next_cursor}")
+        self.assertContains(response, "Старый пост", status_code=200)
+
+        self.client.get("/testUser/unfollow")
+        self.assertFalse(TimelineEntry.objects.filter(user=testUser2).exists())
+        response = self.client.get("/follow/")
+        self.assertNotContains(response, "Новый пост", status_code=200)
+
+
+
+    # Посты автора в группе отбираются запросом и постранично
+    def testAuthorCurrentGroupPosts(self):
+        testUser = User.objects.get(username="testUser")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        other_group = Group.objects.create(title="other_group", slug="other_group", description="description")
+        for i in range(15):
+            Post.objects.create(text=f"Пост в группе {i}", author=testUser, group=group)
+            Post.objects.create(text=f"Пост в другой группе {i}", author=testUser, group=other_group)
+
+        response = self.client.get("/group/test_group/testUser/")
+        page = response.context["page"]
+        self.assertEqual(len(page), 10)
+        self.assertTrue(all(post.group == group for post in page))
+        response = self.client.get(f"/group/test_group/testUser/?after={page.next_cursor}")
+        self.assertEqual([post.text for post in response.context["page"]], [f"Пост в группе {i}" for i in range(4, -1, -1)])
+
+
+
+    # Статистика автора кешируется и сбрасывается при изменении постов и подписок
+    def testAuthorStatsCache(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        post = Post.objects.create(text="Тестовый пост", author=testUser, group=group)
+        self.client.get(f"/testUser/{post.pk}/")
+
+        # Повторно: валидаторы условного GET, автор, пост и его комментарии
+        with self.assertNumQueries(4):
+            response = self.client.get(f"/testUser/{post.pk}/")
+        self.assertEqual(response.context["author_info_dict"]["number_of_records"], 1)
+        self.assertEqual(response.context["author_info_dict"]["group_list"], [("test_group", "test_group")])
+
+        Post.objects.create(text="Еще пост", author=testUser, group=group)
+        Follow.objects.create(user=testUser2, author=testUser)
+        response = self.client.get(f"/testUser/{post.pk}/")
+        self.assertEqual(response.context["author_info_dict"]["number_of_records"], 2)
+        self.assertEqual(response.context["author_info_dict"]["subscribe"], 1)
+        response = self.client.get("/testUser2/")
+        self.assertEqual(response.context["author_info_dict"]["subscribers"], 1)
+
+        group.title = "renamed_group"
+        group.save()
+        response = self.client.get(f"/testUser/{post.pk}/")
+        self.assertEqual(response.context["author_info_dict"]["group_list"], [("renamed_group", "test_group")])
+
+
+
+    # Общий кеш страниц лент: персональные части страницы рендерятся для каждого пользователя
+    def testPerUserPartsOfCachedPage(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        Post.objects.create(text="Тестовый пост", author=testUser)
+        Follow.objects.create(user=testUser2, author=testUser)
+
+        response = self.client.get("/")
+        self.assertContains(response, "Войти", status_code=200)
+        self.assertNotContains(response, "Редактировать", status_code=200)
+
+        self.client.login(username="testUser", password="fjvndyb5248")
+        with self.assertNumQueries(2):
+            response = self.client.get("/")
+        self.assertContains(response, "Пользователь: testUser", status_code=200)
+        self.assertContains(response, "Редактировать", status_code=200)
+        self.assertNotContains(response, "per_user:", status_code=200)
+        self.client.logout()
+
+        self.client.login(username="testUser2", password="dgfhh586hr")
+        response = self.client.get("/")
+        self.assertContains(response, "Пользователь: testUser2", status_code=200)
+        self.assertNotContains(response, "Редактировать", status_code=200)
+        # Кнопка подписки на закешированной странице профиля
+        self.client.get("/testUser/")
+        response = self.client.get("/testUser/")
+        self.assertContains(response, "Отписаться", status_code=200)
+        self.client.logout()
+        response = self.client.get("/testUser/")
+        self.assertNotContains(response, "Отписаться", status_code=200)
+
+        # Заполняются только метки шаблонов персональных частей, остальные остаются как есть
+        request = RequestFactory().get("/")
+        request.user = testUser
+        for marker in [per_user_marker("missing.html", {}), per_user_marker("base.html", {}), "<!--per_user:bm90IGpzb24-->"]:
+            self.assertEqual(fill_per_user(marker, request), marker)
+        self.assertIn("Пользователь: testUser", fill_per_user(per_user_marker("nav.html", {}), request))
+
+
+
+
+    def createImagePost(self, **kwargs):
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(buffer, format="JPEG")
+        image = SimpleUploadedFile("image.jpg", buffer.getvalue(), content_type="image/jpeg")
+        return Post.objects.create(text="Тестовый пост", author=User.objects.get(username="testUser"), image=image, **kwargs)
+
+
+    # Миниатюры картинки поста (все варианты для srcset) создаются заранее, до первого показа ленты
+    def testThumbnailPregeneration(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            post = self.createImagePost()
+
+            thumbnails.generate(post.image.name)
+
+            # Картинка и ее миниатюра записаны в хранилище sorl-thumbnail
+            self.assertIsNotNone(thumbnail_default.kvstore.get(ImageFile(post.image.name)))
+            sizes = []
+            for path, dirs, files in os.walk(os.path.join(media_root, "cache")):
+                for name in files:
+                    with Image.open(os.path.join(path, name)) as thumbnail:
+                        sizes.append(thumbnail.size)
+            self.assertEqual(sorted(sizes), [(320, 113), (480, 170), (640, 226), (960, 339)])
+
+
+
+    # Миниатюры всех постов страницы ищутся одним запросом, независимо от числа постов
+    def testThumbnailBatchLookup(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            for slug, count in (("small_group", 2), ("large_group", 8)):
+                group = Group.objects.create(title=slug, slug=slug, description="description")
+                for i in range(count):
+                    thumbnails.generate(self.createImagePost(group=group).image.name)
+            cache.clear()
+
+            for slug, count in (("small_group", 2), ("large_group", 8)):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(f"/group/{slug}/")
+                self.assertContains(response, "<img", count=count, status_code=200)
+                kvstore_queries = [query for query in queries.captured_queries if "thumbnail_kvstore" in query["sql"]]
+                self.assertEqual(len(kvstore_queries), 1)
+            # Варианты для srcset с заданными размерами, ленивая загрузка всех картинок, кроме первой
+            self.assertEqual(len(re.findall(r'srcset="[^"]* 320w, [^"]* 480w, [^"]* 640w, [^"]* 960w"', response.content.decode())), 8)
+            self.assertContains(response, 'width="960" height="339"', count=8)
+            self.assertContains(response, 'loading="lazy"', count=7)
+
+            # Повторно данные о миниатюрах берутся из кеша
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get("/group/large_group/?page=1")
+            self.assertFalse([query for query in queries.captured_queries if "thumbnail_kvstore" in query["sql"]])
+
+
+
+    # Загруженная картинка уменьшается, поворачивается по EXIF и перекодируется без метаданных
+    def testImageNormalization(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            image = Image.new("RGB", (4000, 3000), "red")
+            exif = image.getexif()
+            exif[0x0112] = 6
+            exif[0x0110] = "Camera"
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", exif=exif.tobytes())
+            upload = SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+            post = Post.objects.create(text="Тестовый пост", author=User.objects.get(username="testUser"), image=upload)
+            original = os.path.join(media_root, post.image.name)
+            # До окончания фоновой обработки карточка показывается с заглушкой,
+            # миниатюры исходного файла в запросе не создаются
+            response = self.client.get("/")
+            self.assertContains(response, 'class="card-img bg-light"', count=1, status_code=200)
+            self.assertNotContains(response, "<img", status_code=200)
+            self.assertLessEqual(response.query_stats.count, settings.QUERY_BUDGETS[("index", "GET")])
+            self.assertFalse(os.path.exists(os.path.join(media_root, "cache")))
+
+            images.normalize(post.pk, post.image.name)
+
+            post.refresh_from_db()
+            self.assertTrue(post.image.name.endswith(".webp"))
+            self.assertFalse(os.path.exists(original))
+            self.assertEqual((post.image_width, post.image_height), (1536, 2048))
+            with Image.open(post.image.path) as normalized:
+                self.assertEqual(normalized.format, "WEBP")
+                self.assertEqual(normalized.size, (1536, 2048))
+                self.assertFalse(normalized.getexif())
+            # Миниатюры созданы для нового файла, закешированная лента показывает его
+            self.assertIsNotNone(thumbnail_default.kvstore.get(ImageFile(post.image.name)))
+            geometry, options = thumbnails.CARD_THUMBNAIL
+            thumbnail = get_thumbnail(post.image.name, geometry, **options)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/")
+            self.assertContains(response, thumbnail.url, status_code=200)
+            self.assertFalse([query for query in queries.captured_queries if query["sql"].startswith("INSERT")])
+
+            # Необработанные картинки догоняет команда normalize_images
+            Post.objects.filter(pk=post.pk).update(image_width=None)
+            out = StringIO()
+            call_command("normalize_images", workers=0, stdout=out, stderr=out)
+            self.assertIn("Обработано картинок: 1, ошибок: 0", out.getvalue())
+            self.assertEqual(Post.objects.get(pk=post.pk).image_width, 1536)
+
+            # Картинку поста заменили, пока шла обработка - результат отбрасывается
+            other = self.createImagePost()
+            Post.objects.filter(pk=other.pk).update(image="posts/replaced.jpg")
+            images.normalize(other.pk, other.image.name)
+            self.assertEqual(Post.objects.get(pk=other.pk).image.name, "posts/replaced.jpg")
+            # Новый файл удален, исходный остался
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(media_root, "posts"))),
+                sorted(os.path.basename(name) for name in (Post.objects.get(pk=post.pk).image.name, other.image.name)),
+            )
+
+
+    # Выполнение отложенных до фиксации транзакции задач (TestCase транзакцию не фиксирует)
+    def runOnCommit(self):
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for savepoint_ids, callback in callbacks:
+            callback()
+
+
+    # Картинка обрабатывается при любом сохранении поста, в том числе из админки,
+    # а у картинок, загруженных раньше, карточка показывает прежнюю миниатюру
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def testImageFromAdminAndExistingImages(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            admin_user = User.objects.create_superuser("admin", "admin@example.com", "fjvndyb5248")
+            self.client.force_login(admin_user)
+            buffer = BytesIO()
+            Image.new("RGB", (1200, 800), "red").save(buffer, format="JPEG")
+            upload = SimpleUploadedFile("admin.jpg", buffer.getvalue(), content_type="image/jpeg")
+            response = self.client.post("/admin/posts/post/add/", {
+                "text": "Пост из админки", "author": User.objects.get(username="testUser").pk, "image": upload,
+            })
+            self.assertEqual(response.status_code, 302)
+            self.runOnCommit()
+            post = Post.objects.get(text="Пост из админки")
+            self.assertTrue(post.image.name.endswith(".webp"))
+            self.assertContains(self.client.get("/"), "<img", count=1, status_code=200)
+
+            # Пост с картинкой, сохраненный до появления вариантов миниатюр: есть только CARD_THUMBNAIL
+            old = self.createImagePost()
+            connection.run_on_commit = []
+            geometry, options = thumbnails.CARD_THUMBNAIL
+            thumbnail = get_thumbnail(old.image.name, geometry, **options)
+            response = self.client.get(f"/testUser/{old.pk}/")
+            self.assertContains(response, f'src="{thumbnail.url}"', status_code=200)
+            self.assertNotContains(response, "srcset=", status_code=200)
+
+            # Редактирование текста без новой картинки не запускает обработку
+            self.client.post(f"/admin/posts/post/{post.pk}/change/", {
+                "text": "Измененный пост", "author": post.author_id,
+            })
+            self.assertEqual(connection.run_on_commit, [])
+
+
+    # Комментарии на странице поста загружаются порциями, с авторами в том же запросе
+    def testPostCommentsPagination(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        small_post = Post.objects.create(text="Тестовый пост", author=testUser)
+        large_post = Post.objects.create(text="Популярный пост", author=testUser)
+        for i in range(3):
+            Comment.objects.create(post=small_post, author=testUser2, text=f"Комментарий {i}")
+        for i in range(25):
+            Comment.objects.create(post=large_post, author=testUser2 if i % 2 else testUser, text=f"Комментарий {i}")
+
+        self.client.get(f"/testUser/{small_post.pk}/")
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.get(f"/testUser/{small_post.pk}/")
+        with CaptureQueriesContext(connection) as large_queries:
+            response = self.client.get(f"/testUser/{large_post.pk}/")
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertContains(response, "Комментарий 24", status_code=200)
+        self.assertNotContains(response, "Комментарий 4<", status_code=200)
+
+        cursor = response.context["comments_cursor"]
+        response = self.client.get(f"/testUser/{large_post.pk}/comments/?after={cursor}")
+        self.assertEqual([item.text for item in response.context["items"]], [f"Комментарий {i}" for i in range(4, -1, -1)])
+        self.assertIsNone(response.context["comments_cursor"])
+        self.assertNotContains(response, "Показать еще", status_code=200)
+
+        # Ссылка "Показать еще" не требует отдельного запроса автора поста
+        response = self.client.get(f"/testUser/{large_post.pk}/comments/")
+        self.assertContains(response, "Показать еще", status_code=200)
+        self.assertLessEqual(response.query_stats.count, settings.QUERY_BUDGETS[("post_comments", "GET")])
+
+
+
+    # Количество запросов к БД на каждой странице (GET) и при каждой записи (POST)
+    # не превышает бюджет из settings.QUERY_BUDGETS и не зависит от количества постов
+    # и комментариев (N+1). Запись проверяется и в режиме ленты подписок "push"
+    def testQueryBudgets(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        for i in range(15):
+            post = Post.objects.create(text=f"Пост номер {i}", author=testUser, group=group)
+            for j in range(3):
+                Comment.objects.create(post=post, author=testUser2 if j % 2 else testUser, text="Комментарий")
+        other_post = Post.objects.create(text="Пост другого автора", author=testUser2, group=group)
+        for j in range(3):
+            Comment.objects.create(post=other_post, author=testUser, text="Комментарий")
+        Follow.objects.create(user=testUser2, author=testUser)
+        self.client.login(username="testUser", password="fjvndyb5248")
+
+        post_data = {"text": "Новый текст", "group": group.pk}
+        requests = [
+            ("index", "get", "/", {}),
+            ("group", "get", "/group/test_group/", {}),
+            ("author_current_group_posts", "get", "/group/test_group/testUser/", {}),
+            ("follow_index", "get", "/follow/", {}),
+            ("profile", "get", "/testUser2/", {}),
+            ("admin_profile", "get", "/testUser/views_posrs/", {}),
+            ("post", "get", f"/testUser2/{other_post.pk}/", {}),
+            ("post_comments", "get", f"/testUser/{post.pk}/comments/", {}),
+            ("post_edit", "get", f"/testUser/{post.pk}/edit/", {}),
+            ("post_edit", "post", f"/testUser/{post.pk}/edit/", post_data),
+            ("new_post", "get", "/new/", {}),
+            ("new_post", "post", "/new/", post_data),
+            ("add_comment", "post", f"/testUser/{post.pk}/comment/", {"text": "Комментарий"}),
+            ("profile_follow", "get", "/testUser2/follow", {}),
+            ("profile_unfollow", "get", "/testUser2/unfollow", {}),
+            ("search", "get", "/search/?q=Пост&group=test_group&author=testUser", {}),
+        ]
+        self.assertEqual(
+            {name for name, method, url, data in requests},
+            {pattern.name for pattern in posts_urls.urlpatterns},
+        )
+        writes = [request for request in requests if request[1] == "post" or "follow" in request[0]]
+        for mode, checked in [("pull", requests), ("push", writes)]:
+            with self.settings(FOLLOW_FEED_MODE=mode):
+                for name, method, url, data in checked:
+                    cache.clear()
+                    response = getattr(self.client, method)(url, data)
+                    self.assertEqual(response.resolver_match.url_name, name)
+                    self.assertLessEqual(
+                        response.query_stats.count, settings.QUERY_BUDGETS[(name, method.upper())],
+                        f"{mode} {method} {name}: {response.query_stats.count} запросов, "
+                        f"самый медленный: {response.query_stats.slowest_sql}",
+                    )
+
+
+
+    # В режиме DEBUG статистика запросов отдается в заголовках ответа
+    @override_settings(DEBUG=True)
+    def testQueryStatsHeaders(self):
+        response = self.client.get("/testUser/")
+        self.assertEqual(int(response["X-DB-Queries"]), response.query_stats.count)
+        self.assertIn("X-DB-Time-Ms", response)
+        self.assertIn("X-DB-Slowest-Ms", response)
+
+
+    # Имена, совпадающие с адресами сайта (например, search), при регистрации заняты:
+    # страница такого пользователя была бы недоступна
+    def testReservedUsernames(self):
+        for username in ["search", "new", "follow", "group", "api", "static"]:
+            response = self.client.post(
+                "/auth/signup/", {"username": username, "password1": "fjvndyb5248", "password2": "fjvndyb5248"},
+            )
+            self.assertEqual(response.status_code, 200, username)
+            self.assertFalse(User.objects.filter(username=username).exists(), username)
+        self.client.post(
+            "/auth/signup/", {"username": "searcher", "password1": "fjvndyb5248", "password2": "fjvndyb5248"},
+        )
+        self.assertTrue(User.objects.filter(username="searcher").exists())
+
+
+    # Поиск по тексту постов: индекс обновляется триггерами, результаты ранжируются и фильтруются
+    def testSearch(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        best = Post.objects.create(text="Поиск поиск поиск по индексу", author=testUser, group=group)
+        other = Post.objects.create(text="Полнотекстовый поиск", author=testUser2)
+        Post.objects.create(text="Запись без совпадений", author=testUser)
+
+        response = self.client.get("/search/?q=поиск")
+        self.assertEqual(list(response.context["page"]), [best, other])
+        self.assertContains(response, "Найдено записей: 2")
+        # Поиск по началу слова и без учета регистра
+        response = self.client.get("/search/?q=ПОЛНОТЕКСТ")
+        self.assertEqual(list(response.context["page"]), [other])
+        response = self.client.get("/search/?q=поиск&group=test_group")
+        self.assertEqual(list(response.context["page"]), [best])
+        response = self.client.get("/search/?q=поиск&author=testUser2")
+        self.assertEqual(list(response.context["page"]), [other])
+        response = self.client.get("/search/?q=поиск&author=nobody")
+        self.assertIsNone(response.context["page"])
+        self.assertContains(response, "Автор не найден")
+        # Синтаксис FTS5 во вводе пользователя не приводит к ошибке
+        response = self.client.get('/search/?q="поиск (индекс*')
+        self.assertEqual(list(response.context["page"]), [best])
+
+        # Индекс следует за изменениями, в том числе в обход сигналов
+        Post.objects.filter(pk=other.pk).update(text="Текст изменен")
+        best.delete()
+        response = self.client.get("/search/?q=поиск")
+        self.assertEqual(list(response.context["page"]), [])
+        response = self.client.get("/search/?q=изменен")
+        self.assertEqual(list(response.context["page"]), [Post.objects.get(pk=other.pk)])
+
+        Post.objects.bulk_create([Post(text=f"Поиск {i}", author=testUser) for i in range(15)])
+        response = self.client.get("/search/?q=поиск&page=2")
+        self.assertEqual(len(response.context["page"]), 5)
+        self.assertContains(response, "?q=%D0%BF%D0%BE%D0%B8%D1%81%D0%BA&amp;page=1")
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Постов в индексе: 17", out.getvalue())
+
+
+
+    # Списки постов и комментариев в админке: число запросов не зависит от числа строк,
+    # без полного COUNT(*) и без выпадающих списков всех постов
+    def testAdminChangelists(self):
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "fjvndyb5248")
+        testUser = User.objects.get(username="testUser")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        self.client.force_login(admin_user)
+
+        def changelist_queries(url):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return [query["sql"] for query in queries.captured_queries]
+
+        for i in range(3):
+            post = Post.objects.create(text=f"Пост номер {i}", author=testUser, group=group)
+            Comment.objects.create(post=post, author=testUser, text="Комментарий")
+        post_queries = changelist_queries("/admin/posts/post/")
+        comment_queries = changelist_queries("/admin/posts/comment/")
+        for i in range(20):
+            post = Post.objects.create(text=f"Пост номер {i}", author=testUser, group=group)
+            Comment.objects.create(post=post, author=testUser, text="Комментарий")
+        self.assertEqual(len(changelist_queries("/admin/posts/post/")), len(post_queries))
+        self.assertEqual(len(changelist_queries("/admin/posts/comment/")), len(comment_queries))
+        self.assertFalse([sql for sql in post_queries if 'SELECT COUNT(*) AS "__count" FROM "posts_post"' in sql])
+        # Фильтр по годам не строится через dates() - полный просмотр таблицы
+        self.assertFalse([sql for sql in post_queries if "SELECT DISTINCT django_date" in sql])
+
+        response = self.client.get("/admin/posts/post/?q=номер+1")
+        self.assertEqual(response.context["cl"].result_count, 12)
+        response = self.client.get(f"/admin/posts/post/?year={post.pub_date.year}")
+        self.assertEqual(response.context["cl"].result_count, 23)
+        self.assertContains(response, f"?year={post.pub_date.year}")
+        response = self.client.get(f"/admin/posts/post/?year={post.pub_date.year - 1}")
+        self.assertEqual(response.context["cl"].result_count, 0)
+        response = self.client.get(f"/admin/posts/comment/{post.post_comment.first().pk}/change/")
+        self.assertNotContains(response, "<option", status_code=200)
+
+
+
+    # JSON API лент: курсорная пагинация, компактные поля, один запрос на страницу
+    def testJsonApi(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        for i in range(12):
+            post = Post.objects.create(text=f"Пост номер {i}", author=testUser, group=group if i % 2 else None)
+        Comment.objects.create(post=post, author=testUser2, text="Комментарий")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/posts/")
+        self.assertEqual(len(queries), 1)
+        data = response.json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(data["results"][0], {
+            "id": post.pk,
+            "text": "Пост номер 11",
+            "pub_date": DjangoJSONEncoder().default(post.pub_date),
+            "author": "testUser",
+            "group": "test_group",
+            "image": None,
+            "comment_count": 1,
+        })
+        data = self.client.get("/api/v1/posts/" + data["next"]).json()
+        self.assertEqual([item["text"] for item in data["results"]], ["Пост номер 1", "Пост номер 0"])
+        self.assertIsNone(data["next"])
+
+        data = self.client.get("/api/v1/group/test_group/?limit=2").json()
+        self.assertEqual([item["text"] for item in data["results"]], ["Пост номер 11", "Пост номер 9"])
+        self.assertIsNotNone(data["next"])
+        data = self.client.get("/api/v1/users/testUser2/posts/").json()
+        self.assertEqual(data, {"results": [], "next": None})
+        data = self.client.get(f"/api/v1/posts/{post.pk}/comments/").json()
+        self.assertEqual([(item["author"], item["text"]) for item in data["results"]], [("testUser2", "Комментарий")])
+
+        # Кешированная лента обновляется после публикации
+        Post.objects.create(text="Новый пост", author=testUser2)
+        data = self.client.get("/api/v1/posts/").json()
+        self.assertEqual(data["results"][0]["text"], "Новый пост")
+
+        # Ответ из кеша отдается как есть: тот же Content-Type, метки персональных частей
+        # в тексте поста не заполняются (в том числе метки несуществующих шаблонов)
+        for template_name in ["nav.html", "missing.html"]:
+            marker = per_user_marker(template_name, {})
+            Post.objects.create(text=marker, author=testUser2)
+            for _ in range(2):
+                response = self.client.get("/api/v1/posts/?limit=1")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"], "application/json")
+                self.assertEqual(response.json()["results"][0]["text"], marker)
+
+        self.assertEqual(self.client.get("/api/v1/follow/").status_code, 401)
+        self.client.login(username="testUser2", password="dgfhh586hr")
+        self.client.get("/testUser/follow")
+        data = self.client.get("/api/v1/follow/?limit=3").json()
+        self.assertEqual([item["text"] for item in data["results"]], ["Пост номер 11", "Пост номер 10", "Пост номер 9"])
+        with self.settings(FOLLOW_FEED_MODE="push"):
+            call_command("rebuild_follow_feed", stdout=StringIO())
+            self.assertEqual(self.client.get("/api/v1/follow/?limit=3").json(), data)
+
+        for url in ["/api/v1/posts/", "/api/v1/group/test_group/", "/api/v1/users/testUser/posts/",
+                    "/api/v1/follow/", f"/api/v1/posts/{post.pk}/comments/"]:
+            cache.clear()
+            response = self.client.get(url)
+            name = response.resolver_match.url_name
+            self.assertLessEqual(response.query_stats.count, settings.QUERY_BUDGETS[(name, "GET")], name)
+
+
+
+    # Условный GET: повторный запрос неизменной страницы получает 304 без рендера,
+    # изменения постов, комментариев и подписок меняют ETag
+    def testConditionalGet(self):
+        testUser = User.objects.get(username="testUser")
+        testUser2 = User.objects.get(username="testUser2")
+        post = Post.objects.create(text="Тестовый пост", author=testUser)
+
+        for url in ["/", "/testUser/", f"/testUser/{post.pk}/"]:
+            response = self.client.get(url)
+            self.assertIn("Last-Modified", response)
+            self.assertIn("Cookie", response["Vary"])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertLessEqual(len(queries), 1)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, 304)
+
+        def etag(url):
+            return self.client.get(url)["ETag"]
+
+        index_etag, post_etag = etag("/"), etag(f"/testUser/{post.pk}/")
+        Comment.objects.create(post=post, author=testUser2, text="Комментарий")
+        self.assertNotEqual(etag("/"), index_etag)
+        self.assertNotEqual(etag(f"/testUser/{post.pk}/"), post_etag)
+
+        post_etag = etag(f"/testUser/{post.pk}/")
+        updated = post.updated
+        self.client.login(username="testUser", password="fjvndyb5248")
+        self.assertNotEqual(etag(f"/testUser/{post.pk}/"), post_etag)
+        post_etag = etag(f"/testUser/{post.pk}/")
+        self.client.post(f"/testUser/{post.pk}/edit/", {"text": "Измененный пост"})
+        self.assertGreater(Post.objects.get(pk=post.pk).updated, updated)
+        self.assertNotEqual(etag(f"/testUser/{post.pk}/"), post_etag)
+
+        profile_etag = etag("/testUser2/")
+        self.client.get("/testUser2/follow")
+        self.assertNotEqual(etag("/testUser2/"), profile_etag)
+
+    # Запросы к несуществующим сообществам и авторам не оставляют ключей в кеше
+    def testNoCacheEntriesFor404(self):
+        cache.clear()
+        for url in [
+            "/group/no-such-group/", "/group/no-such-group/no_such_user/", "/no_such_user/",
+            "/api/v1/group/no-such-group/", "/api/v1/users/no_such_user/posts/",
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(cache._cache, {}, url)
+
+        response = self.client.get("/testUser/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(cache.get("feed_version:author:testUser"))
+        # Начальная версия записывается один раз: повторный запрос берет страницу из кеша
+        self.assertEqual(self.client.get("/testUser/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+
+
+    # Карточки постов рендерятся тегом {% post_cards %}: URL разворачиваются один раз на страницу
+    # и совпадают с тем, что дает reverse()
+    def testPostCards(self):
+        author = User.objects.create_user(username="user.name+1@test", password="fjvndyb5248")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        post = Post.objects.create(text="Тестовый пост", author=author, group=group)
+        urls = PageUrls().for_post(post)
+        self.assertEqual(urls, {
+            "profile": reverse("profile", args=[author.username]),
+            "group": reverse("group", args=["test_group"]),
+            "post": reverse("post", args=[author.username, post.pk]),
+            "edit": reverse("post_edit", args=[author.username, post.pk]),
+        })
+
+        # Значения, похожие на заглушки, подставляются на свои места
+        page_urls = PageUrls()
+        for username in ["9000000001", "9000000000", "~0~", "~1~"]:
+            lookalike = Post.objects.create(text="Тестовый пост", author=User.objects.create_user(username=username))
+            self.assertEqual(page_urls.for_post(lookalike), {
+                "profile": reverse("profile", args=[username]),
+                "group": "",
+                "post": reverse("post", args=[username, lookalike.pk]),
+                "edit": reverse("post_edit", args=[username, lookalike.pk]),
+            })
+
+        self.client.login(username="user.name+1@test", password="fjvndyb5248")
+        response = self.client.get("/")
+        for url in urls.values():
+            self.assertContains(response, f'href="{url}"')
+        response = self.client.get(urls["post"])
+        self.assertContains(response, f'href="{urls["edit"]}"')
+        self.assertNotContains(response, 'loading="lazy"')
+
+
+
+    # Карточки постов общие для всех лент и пользователей и сбрасываются при изменении поста,
+    # комментариях и изменении автора или сообщества. Ссылка на редактирование - только у автора
+    def testPostCardCache(self):
+        testUser = User.objects.get(username="testUser")
+        group = Group.objects.create(title="test_group", slug="test_group", description="description")
+        post = Post.objects.create(text="Тестовый пост", author=testUser, group=group)
+        Post.objects.create(text="Второй пост", author=User.objects.get(username="testUser2"))
+        card_cache.stats.reset()
+
+        self.client.get("/")
+        self.assertEqual((card_cache.stats.hits, card_cache.stats.misses), (0, 2))
+        # Другие ленты и страница поста берут карточку из кеша
+        for url in ["/group/test_group/", "/testUser/", f"/testUser/{post.pk}/"]:
+            self.assertContains(self.client.get(url), "Тестовый пост")
+        self.assertEqual((card_cache.stats.hits, card_cache.stats.misses), (3, 2))
+        self.assertEqual(card_cache.stats.ratio, 0.6)
+
+        self.client.login(username="testUser", password="fjvndyb5248")
+        self.assertContains(self.client.get("/group/test_group/?page=1"), f'href="/testUser/{post.pk}/edit/"')
+        self.client.login(username="testUser2", password="dgfhh586hr")
+        response = self.client.get("/group/test_group/?page=1")
+        self.assertContains(response, f'href="/testUser/{post.pk}/"')
+        self.assertNotContains(response, "/edit/")
+
+        self.client.post(f"/testUser/{post.pk}/comment/", {"text": "Комментарий"})
+        self.assertContains(self.client.get("/search/?q=Тестовый"), "1 комментариев")
+        group.title = "Новое название"
+        group.save()
+        self.assertContains(self.client.get("/search/?q=Тестовый"), "#Новое название")
+        testUser.username = "renamedUser"
+        testUser.save()
+        self.assertContains(self.client.get("/search/?q=Тестовый"), "@renamedUser")
+        self.client.login(username="renamedUser", password="fjvndyb5248")
+        self.client.post(f"/renamedUser/{post.pk}/edit/", {"text": "Тестовый пост изменен"})
+        self.assertContains(self.client.get("/search/?q=Тестовый"), "Тестовый пост изменен")
+
+
+
+    # collectstatic пишет файлы с хешем в имени и сжатые копии, страницы ссылаются на них,
+    # а отдаются они со сжатием и кешированием в браузере навсегда
+    def testStaticFiles(self):
+        # Каталоги исходников есть в репозитории - collectstatic не падает на чистой копии
+        for directory in settings.STATICFILES_DIRS:
+            self.assertTrue(os.path.isdir(directory), directory)
+        with tempfile.TemporaryDirectory() as assets, tempfile.TemporaryDirectory() as static_root:
+            css = "body { margin: 0; }\n" * 100
+            os.makedirs(os.path.join(assets, "bootstrap", "dist", "css"))
+            with open(os.path.join(assets, "bootstrap", "dist", "css", "bootstrap.min.css"), "w") as source:
+                source.write(css)
+            with override_settings(STATICFILES_DIRS=[assets], STATIC_ROOT=static_root):
+                call_command("collectstatic", interactive=False, verbosity=0)
+
+                response = self.client.get("/")
+                url = re.search(r'href="(/static/bootstrap/dist/css/bootstrap\.min\.[0-9a-f]{12}\.css)"', response.content.decode()).group(1)
+                self.assertTrue(os.path.exists(os.path.join(static_root, url[len("/static/"):] + ".gz")))
+
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(gzip.decompress(b"".join(response.streaming_content)).decode(), css)
+                self.assertLess(int(response["Content-Length"]), len(css))
+
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+                self.assertFalse(response.has_header("Content-Encoding"))
+                self.assertEqual(b"".join(response.streaming_content).decode(), css)
+
+                # Файл без хеша в имени браузер перепроверяет
+                response = self.client.get("/static/bootstrap/dist/css/bootstrap.min.css")
+                self.assertEqual(response["Cache-Control"], "public, no-cache")
+                response = self.client.get(
+                    "/static/bootstrap/dist/css/bootstrap.min.css", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(self.client.get("/static/../manage.py").status_code, 404)
+
+        # Маршрут статики подключается только для собранной статики при DEBUG = False
+        self.assertTrue(staticfiles.serving_enabled())
+        with override_settings(DEBUG=True):
+            self.assertFalse(staticfiles.serving_enabled())
+        with override_settings(SERVE_STATIC=False):
+            self.assertFalse(staticfiles.serving_enabled())
+
+
+
+    # Синтетические данные: пачками, с датами в прошлом и степенным распределением постов по авторам
+    def testSeedData(self):
+        out = StringIO()
+        self.client.get("/")
+        cache.set("unrelated", 1)
+        call_command("seed_data", users=20, groups=2, posts=500, comments=300, follows=100, seed=1, stdout=out)
+        self.assertIn("Post: 500 строк", out.getvalue())
+        # Кеш не очищается целиком: сброшены только затронутые ленты
+        self.assertEqual(cache.get("unrelated"), 1)
+        self.assertContains(self.client.get("/"), "seed-", status_code=200)
+        posts = Post.objects.filter(author__username__startswith="seed")
+        self.assertEqual(posts.count(), 500)
+        self.assertEqual(Comment.objects.filter(post__in=posts).count(), 300)
+        self.assertGreater(posts.values("pub_date__date").distinct().count(), 100)
+        post = posts.order_by("-comment_count").first()
+        self.assertEqual(post.comment_count, post.post_comment.count())
+        self.assertFalse(Follow.objects.filter(author__username__startswith="seed", user=F("author")).exists())
+
+        counts = sorted(
+            User.objects.filter(username__startswith="seed").annotate(total=Count("author_post"))
+            .values_list("total", flat=True),
+            reverse=True,
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+
+        with self.assertRaises(CommandError):
+            call_command("seed_data", users=2, stdout=out)
+
+
+
+# Кеш в файле SQLite, общий для процессов сервера
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.tmp.name, "cache.sqlite3")
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def testOperations(self):
+        self.cache.set("page", {"html": "<p>Пост</p>"})
+        self.assertEqual(self.cache.get("page"), {"html": "<p>Пост</p>"})
+        self.assertFalse(self.cache.add("page", "other"))
+        self.assertEqual(self.cache.get_many(["page", "missing"]), {"page": {"html": "<p>Пост</p>"}})
+
+        self.cache.set("version", 1, None)
+        self.assertEqual(self.cache.incr("version"), 2)
+        self.assertEqual(self.cache.get("version"), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+        self.cache.set("short", "value", 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("short"))
+        self.assertTrue(self.cache.add("short", "new value"))
+
+        self.cache.delete("page")
+        self.assertIsNone(self.cache.get("page"))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("version"))
+
+    def testSharedBetweenProcesses(self):
+        self.cache.set("version", 1, None)
+        context = multiprocessing.get_context("fork")
+        worker = context.Process(target=lambda: SQLiteCache(self.location, {}).incr("version"))
+        worker.start()
+        worker.join()
+        self.assertEqual(self.cache.get("version"), 2)
+
+    def testCull(self):
+        cache = SQLiteCache(self.location, {"OPTIONS": {"MAX_ENTRIES": 10, "CULL_FREQUENCY": 2, "CULL_EVERY": 5}})
+        cache.set("version", 1, None)
+        for i in range(20):
+            cache.set(f"page_{i}", i)
+        self.assertEqual(cache.get("version"), 1)
+        self.assertIsNotNone(cache.get("page_19"))
+        self.assertLessEqual(len(cache.get_many(["version"] + [f"page_{i}" for i in range(20)])), 10 + 5)
+
+        # Размер кеша (COUNT(*) по всей таблице) проверяется раз в CULL_EVERY записей, а не при каждой
+        cache.clear()
+        statements = []
+        cache._connection().set_trace_callback(statements.append)
+        for i in range(10):
+            cache.set(f"page_{i}", i)
+        cache._connection().set_trace_callback(None)
+        self.assertEqual(len([sql for sql in statements if "COUNT(*)" in sql]), 2)
+
+
+
+# Чтение с реплик (posts.replicas): реплики - отдельные файлы SQLite со своими данными,
+# поэтому видно, из какой БД читает страница
+@override_settings(
+    DATABASE_REPLICAS=["replica1", "replica2"],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+)
+class ReplicaRoutingTest(TestCase):
+    replicas = ["replica1", "replica2"]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        for alias in cls.replicas:
+            connections.databases[alias] = {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(cls.tmp.name, f"{alias}.sqlite3"),
+            }
+        call_command("migrate", database="replica1", verbosity=0)
+        author = User.objects.db_manager("replica1").create_user(username="replicaAuthor", password="fjvndyb5248")
+        Post.objects.using("replica1").create(text="Пост с реплики", author=author)
+        connections["replica1"].close()
+        shutil.copy(connections.databases["replica1"]["NAME"], connections.databases["replica2"]["NAME"])
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.replicas:
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.writer = User.objects.create_user(username="writer", password="fjvndyb5248")
+        Post.objects.create(text="Пост в основной БД", author=self.writer)
+
+    def testReadsFromReplicas(self):
+        with CaptureQueriesContext(connection) as primary_queries:
+            response = self.client.get("/")
+        self.assertContains(response, "Пост с реплики")
+        self.assertNotContains(response, "Пост в основной БД")
+        self.assertFalse([query for query in primary_queries.captured_queries if "posts_post" in query["sql"]])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        # Страница поста тоже читается с реплик
+        post = Post.objects.using("replica1").get()
+        self.assertEqual(self.client.get(f"/replicaAuthor/{post.pk}/").status_code, 200)
+        primary_post = Post.objects.get(author=self.writer)
+        self.assertEqual(self.client.get(f"/writer/{primary_post.pk}/").status_code, 404)
+
+    # После записи клиент читает свои изменения из основной БД
+    def testReadYourWrites(self):
+        self.client.login(username="writer", password="fjvndyb5248")
+        response = self.client.post("/new/", {"text": "Новый пост"}, follow=True)
+        self.assertIn(STICKY_COOKIE, self.client.cookies)
+        self.assertContains(response, "Новый пост")
+        self.assertContains(self.client.get("/"), "Пост в основной БД")
+
+        # Другие клиенты читают с реплик
+        response = Client().get("/")
+        self.assertNotContains(response, "Новый пост")
+        self.assertContains(response, "Пост с реплики")
+
+        # Подписка пишет на GET-запрос и тоже привязывает клиента к основной БД
+        client = Client()
+        client.login(username="writer", password="fjvndyb5248")
+        User.objects.create_user(username="followed", password="fjvndyb5248")
+        response = client.get("/followed/follow")
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertTrue(Follow.objects.filter(user=self.writer, author__username="followed").exists())
+
+        # Открытие формы и отправка формы с ошибкой ничего не пишут и клиента не привязывают
+        post = Post.objects.get(text="Пост в основной БД")
+        for method, url in [("get", "/new/"), ("get", f"/writer/{post.pk}/edit/"), ("post", "/new/")]:
+            writer = Client()
+            writer.login(username="writer", password="fjvndyb5248")
+            response = getattr(writer, method)(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotIn(STICKY_COOKIE, response.cookies, url)
+
+    # Страницы, карточки и статистика, прочитанные с реплики в первые REPLICA_STICKY_SECONDS
+    # после изменения, отдаются без сохранения в кеш и без ETag: реплика могла еще не догнать
+    # основную БД. После этого окна страницы кешируются как обычно
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "replicas"}})
+    def testNoCachingOfLaggingReplicaReads(self):
+        author = User.objects.db_manager("replica1").get(username="replicaAuthor")
+        try:
+            # Пост в основной БД только что создан (setUp) - область "posts" изменена
+            response = self.client.get("/")
+            self.assertContains(response, "Пост с реплики")
+            self.assertNotIn("ETag", response)
+            for alias in self.replicas:
+                Post.objects.using(alias).bulk_create([Post(text="Реплика догнала", author_id=author.pk)])
+            self.assertContains(self.client.get("/"), "Реплика догнала")
+
+            with self.settings(REPLICA_STICKY_SECONDS=0):
+                response = self.client.get("/")
+                self.assertIn("ETag", response)
+                for alias in self.replicas:
+                    Post.objects.using(alias).bulk_create([Post(text="Еще не в кеше", author_id=author.pk)])
+                self.assertNotContains(self.client.get("/"), "Еще не в кеше")
+        finally:
+            for alias in self.replicas:
+                Post.objects.using(alias).exclude(text="Пост с реплики")._raw_delete(alias)
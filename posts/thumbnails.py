@@ -0,0 +1,138 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings, defaults as thumbnail_defaults
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBKVStore
+from sorl.thumbnail.models import KVStore
+
+logger = logging.getLogger(__name__)
+
+# Миниатюра карточки поста (post_item.html)
+CARD_THUMBNAIL = ("960x339", {"crop": "center", "upscale": True})
+
+# Ширины вариантов миниатюры карточки для srcset, пропорции - как у CARD_THUMBNAIL.
+# Браузер выбирает вариант по ширине карточки на экране и плотности пикселей
+CARD_WIDTHS = [320, 480, 640, 960]
+
+
+def _card_variant(width):
+    card_width, card_height = (int(side) for side in CARD_THUMBNAIL[0].split("x"))
+    return f"{width}x{round(width * card_height / card_width)}", CARD_THUMBNAIL[1]
+
+
+CARD_VARIANTS = [_card_variant(width) for width in CARD_WIDTHS]
+
+# Размеры миниатюр, которые используют шаблоны
+THUMBNAIL_GEOMETRIES = CARD_VARIANTS
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "THUMBNAIL_WORKERS", 2),
+            thread_name_prefix="thumbnails",
+        )
+    return _executor
+
+
+# Создание миниатюр картинки (и записей о них в хранилище sorl-thumbnail)
+def generate(image_name):
+    for geometry, options in THUMBNAIL_GEOMETRIES:
+        get_thumbnail(image_name, geometry, **options)
+
+
+def _run_logged(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Ошибка фоновой обработки: %s%r", func.__name__, args)
+
+
+# Задача в потоке пула (этого или пула команды): возвращает результат func
+def run_in_thread(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Соединения с БД открываются в потоке пула - закрываем их
+        connections.close_all()
+
+
+# Передаем задачу пулу фоновых потоков после фиксации транзакции, чтобы ответ
+# на запрос не ждал обработки картинок. THUMBNAIL_WORKERS = 0 - выполнять сразу, в том же потоке
+def submit(func, *args):
+    if getattr(settings, "THUMBNAIL_WORKERS", 2) == 0:
+        transaction.on_commit(lambda: _run_logged(func, *args))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(run_in_thread, _run_logged, func, *args))
+
+
+# Файл миниатюры с теми же опциями и именем, что вычисляет get_thumbnail() sorl-thumbnail
+def _thumbnail_file(image_name, geometry, options):
+    backend = default.backend
+    source = ImageFile(image_name)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(backend._get_thumbnail_filename(source, geometry, options), default.storage)
+
+
+# post.thumbnail - наибольший вариант (src и размеры <img>), post.srcset - все варианты.
+# Наибольший вариант совпадает с прежней миниатюрой карточки (CARD_THUMBNAIL): у картинок,
+# загруженных до появления вариантов, он уже есть, и карточка показывает его без srcset
+def _set_variants(post, variants):
+    if not variants or variants[-1] is None:
+        return
+    post.thumbnail = variants[-1]
+    if None not in variants:
+        post.srcset = ", ".join(f"{variant.url} {variant.width}w" for variant in variants)
+
+
+# Варианты миниатюры карточки для всех постов страницы одним обращением к кешу
+# и не более чем одним запросом к БД (вместо запроса на каждый тег {% thumbnail %}).
+# В запросе миниатюры не создаются: их создает фоновая обработка картинки (posts.images),
+# до ее окончания у поста нет post.thumbnail и карточка показывает заглушку.
+# Картинки без миниатюр (загруженные раньше) обрабатывает команда normalize_images
+def attach(posts):
+    files = {}
+    for post in posts:
+        if not post.image:
+            continue
+        try:
+            files[post] = [_thumbnail_file(post.image.name, geometry, options) for geometry, options in CARD_VARIANTS]
+        except Exception:
+            logger.exception("Не удалось получить миниатюру для %s", post.image.name)
+    if not files:
+        return
+    if not isinstance(default.kvstore, CachedDBKVStore):
+        for post, post_files in files.items():
+            _set_variants(post, [default.kvstore.get(file) for file in post_files])
+        return
+
+    keys = {post: [add_prefix(file.key) for file in post_files] for post, post_files in files.items()}
+    all_keys = [key for post_keys in keys.values() for key in post_keys]
+    kv_cache = default.kvstore.cache
+    values = kv_cache.get_many(all_keys)
+    missing = [key for key in all_keys if not isinstance(values.get(key), str)]
+    if missing:
+        found = dict(KVStore.objects.filter(key__in=missing).values_list("key", "value"))
+        kv_cache.set_many(found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    for post, post_keys in keys.items():
+        _set_variants(post, [
+            deserialize_image_file(values[key]) if isinstance(values.get(key), str) else None
+            for key in post_keys
+        ])
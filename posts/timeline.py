@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import DateTimeField, F, IntegerField, Value
+
+from .models import Post, Follow, TimelineEntry
+
+
+# Режимы ленты подписок:
+# "pull" - лента собирается запросом к постам при каждом открытии /follow/,
+# "push" - посты раскладываются по лентам подписчиков при публикации
+def push_mode():
+    return getattr(settings, "FOLLOW_FEED_MODE", "pull") == "push"
+
+
+# Записи ленты одним запросом INSERT ... SELECT: значения полей записи (выражения columns)
+# выбираются из queryset и не передаются через Python. Уже существующие записи пропускаются
+def _insert_entries(queryset, **columns):
+    names = [f"entry_{name}" for name in columns]
+    queryset = queryset.order_by().annotate(**dict(zip(names, columns.values()))).values_list(*names)
+    using = router.db_for_write(TimelineEntry)
+    connection = connections[using]
+    select, params = queryset.query.get_compiler(using=using).as_sql()
+    sql = "%s %s (%s) %s %s" % (
+        connection.ops.insert_statement(ignore_conflicts=True),
+        connection.ops.quote_name(TimelineEntry._meta.db_table),
+        ", ".join(connection.ops.quote_name(TimelineEntry._meta.get_field(name).column) for name in columns),
+        select,
+        connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+# Раскладываем новый пост по лентам подписчиков автора
+def fan_out_post(post):
+    _insert_entries(
+        Follow.objects.filter(author=post.author_id),
+        user=F("user"), post=Value(post.pk, IntegerField()),
+        author=F("author"), pub_date=Value(post.pub_date, DateTimeField()),
+    )
+
+
+# Заполняем ленту подписчика постами автора при подписке
+def backfill(user, author):
+    _insert_entries(
+        Post.objects.filter(author=author),
+        user=Value(user.pk, IntegerField()), post=F("pk"), author=F("author"), pub_date=F("pub_date"),
+    )
+
+
+# Убираем посты автора из ленты при отписке
+def prune(user, author):
+    TimelineEntry.objects.filter(user=user, author=author).delete()
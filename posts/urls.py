@@ -8,6 +8,7 @@ urlpatterns = [
     path("group/<slug>/", views.group_posts, name="group"),
     path("group/<slug>/<username>/", views.author_current_group_posts, name="author_current_group_posts"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
     path("<username>/follow", views.profile_follow, name="profile_follow"),
     path("<username>/unfollow", views.profile_unfollow, name="profile_unfollow"),
     # Профайл пользователя
@@ -17,4 +18,5 @@ urlpatterns = [
     path("<username>/<int:post_id>/", views.post_view, name="post"),
     path("<username>/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path("<username>/<int:post_id>/comment/", views.add_comment, name="add_comment"),
+    path("<username>/<int:post_id>/comments/", views.post_comments, name="post_comments"),
 ]
\ No newline at end of file
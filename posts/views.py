@@ -1,14 +1,18 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
-from django.views.decorators.cache import cache_page
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator
 from django.shortcuts import redirect
-from django.db.models import Count
+from django.core.paginator import Paginator
 import datetime as dt
 
-from .models import Post, Group, Comment, Follow
-from .forms import NewPost, CommentForm
+from .models import Post, Group, Comment, Follow, TimelineEntry
+from .forms import NewPost, CommentForm, SearchForm
+from .feed_cache import conditional_page, versioned_cache_page
+from .pagination import COMMENTS_PER_PAGE, POSTS_PER_PAGE, CursorPaginator, encode_cursor, paginate_feed
+from .replicas import primary_db
+from .search import search_posts
+from .stats import AuthorStats
+from . import timeline
 
 User = get_user_model()
 
@@ -23,25 +27,44 @@ def user_validate(func):
     return added_value
 
 
-@cache_page(20, key_prefix="index_page")
+@conditional_page("posts")
+@versioned_cache_page("posts")
 def index(request):
-    post_list = Post.objects.select_related("author", "group").annotate(comment_count=Count("post_comment")).order_by("-pub_date")
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.select_related("author", "group").order_by("-pub_date")
+    page, paginator = paginate_feed(request, post_list)
     return render(request, 'index.html', {"page": page, "paginator": paginator})
 
 
 # view-функция для страницы сообщества
+@conditional_page("group:{slug}")
+@versioned_cache_page("group:{slug}")
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.select_related("author", "group").annotate(comment_count=Count("post_comment")).filter(group=group).order_by("-pub_date")
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.select_related("author", "group").filter(group=group).order_by("-pub_date")
+    page, paginator = paginate_feed(request, post_list)
     return render(request, 'group.html', {"group":group, "page": page, "paginator": paginator})
 
 
+# Поиск по тексту постов с фильтрами по сообществу и автору, по убыванию релевантности
+def search(request):
+    form = SearchForm(request.GET or None)
+    page = paginator = None
+    if form.is_valid():
+        results = search_posts(form.cleaned_data["q"], form.cleaned_data["group"], form.cleaned_data["author"])
+        paginator = Paginator(results, POSTS_PER_PAGE)
+        page = paginator.get_page(request.GET.get("page"))
+    # Параметры поиска сохраняются в ссылках на другие страницы результатов
+    query = request.GET.copy()
+    query.pop("page", None)
+    return render(request, "search.html", {
+        "form": form,
+        "page": page,
+        "paginator": paginator,
+        "query": query.urlencode(),
+        })
+
+
+@primary_db
 @login_required
 # View-функция для страницы добавления новой записи
 def new_post(request):
@@ -51,6 +74,8 @@ def new_post(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if timeline.push_mode():
+                timeline.fan_out_post(post)
             return redirect("/")
         # Автоматическое заполнение прошедшими валидацию данными всех полей(после ошибки)
         return render(request, "new_post.html", {"form": form})
@@ -59,14 +84,12 @@ def new_post(request):
 
 
 # Профиль пользователя
+@conditional_page("author:{username}")
+@versioned_cache_page("author:{username}")
 def profile(request, username):
     author_info_dict = profile_author(request, username)
-    # показывать по 10 записей на странице.
-    paginator = Paginator(author_info_dict["post_list"], 10)
-    # переменная в URL с номером запрошенной страницы
-    page_number = request.GET.get("page")
-    # получить записи с нужным смещением
-    page = paginator.get_page(page_number)
+    # показывать по 10 записей на странице, по номеру страницы или по курсору
+    page, paginator = paginate_feed(request, author_info_dict["post_list"])
     return render(request, "profile.html",
         {
         "page": page,
@@ -76,21 +99,51 @@ def profile(request, username):
         })
 
 
+# Валидаторы страницы поста: время изменения поста и число комментариев
+def post_validators(request, username, post_id):
+    post = Post.objects.filter(pk=post_id).values_list("updated", "comment_count").first()
+    if post is None:
+        return "", 0
+    updated, comment_count = post
+    return f"{updated.isoformat()}:{comment_count}", updated.timestamp()
+
+
 # Страница поста
+@conditional_page("author:{username}", extra=post_validators)
 def post_view(request, username,post_id,):
     author_info_dict = profile_author(request, username)
-    post = get_object_or_404(Post.objects.select_related("author", "group").annotate(comment_count=Count("post_comment")), pk=post_id, author=author_info_dict["author"])
+    post = get_object_or_404(Post.objects.select_related("author", "group"), pk=post_id, author=author_info_dict["author"])
     form = CommentForm(request.POST or None, files=request.FILES or None)
-    items = Comment.objects.filter(post=post_id).order_by("-created")
+    # Первая порция комментариев вместе с авторами, остальные - по курсору (post_comments)
+    items = Comment.objects.select_related("author").filter(post=post).order_by("-created", "-pk")[:COMMENTS_PER_PAGE]
+    comments_cursor = None
+    if len(items) == COMMENTS_PER_PAGE and post.comment_count > COMMENTS_PER_PAGE:
+        comments_cursor = encode_cursor(items[len(items) - 1], date_field="created")
     return render(request, "post.html", {
         "author_info_dict":author_info_dict,
         "post": post,
         "form": form,
         "items": items,
+        "comments_cursor": comments_cursor,
         "author": author_info_dict["author"],
         })
 
 
+# Следующая порция комментариев поста (HTML-фрагмент для страницы поста)
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related("author"), pk=post_id, author__username=username)
+    paginator = CursorPaginator(
+        Comment.objects.select_related("author").filter(post=post), COMMENTS_PER_PAGE, date_field="created"
+    )
+    page = paginator.get_page(after=request.GET.get("after"))
+    return render(request, "comment_items.html", {
+        "post": post,
+        "items": page,
+        "comments_cursor": page.next_cursor,
+        })
+
+
+@primary_db
 @user_validate
 # Редактирование поста
 def post_edit(request, username, post_id):
@@ -101,6 +154,9 @@ def post_edit(request, username, post_id):
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
+            if "image" in form.changed_data:
+                # Размеры заполнит нормализация новой картинки
+                post.image_width = post.image_height = None
             post.save()
             # Перенаправляем пользователя на главную страницу
             return redirect(f"/{username}/{post_id}/")
@@ -113,15 +169,9 @@ def post_edit(request, username, post_id):
 def author_current_group_posts(request, username, slug):
     author_info_dict = profile_author(request, username)
     group_current = get_object_or_404(Group, slug=slug)
-    # Получаем список постов в выбранной группе
-    group_current_post_list = []
-    for post in author_info_dict["post_list"]:
-        if post.group == group_current:
-            group_current_post_list.append(post)
-        
-    paginator = Paginator(group_current_post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    # Посты автора в выбранной группе фильтруем в запросе (индекс по автору и дате)
+    post_list = author_info_dict["post_list"].filter(group=group_current)
+    page, paginator = paginate_feed(request, post_list)
     return render(request, "profile.html",
         {
         "page": page,
@@ -141,6 +191,7 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+@primary_db
 @login_required
 # Добавление коментария
 def add_comment(request, username, post_id):
@@ -163,25 +214,17 @@ def add_comment(request, username, post_id):
 # Информация об авторе
 def profile_author(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = Post.objects.select_related("author", "group").annotate(comment_count=Count("post_comment")).filter(author=author).order_by("-pub_date")
-    # Получаем "title" и "slug" групп с постами автора.
-    # К сожалению distinct() не убрал повторения, поэтому оставил set
-    group_list = set(post_list.values_list("group__title", "group__slug"))
-    number_of_records = post_list.count()
-    subscribe = Follow.objects.filter(author=author).count()
-    subscribers = Follow.objects.filter(user=author).count()
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user, author=author)
-    else:
-        following = []
+    post_list = Post.objects.select_related("author", "group").filter(author=author).order_by("-pub_date")
+    # Количество записей, подписок и группы автора берем из кеша
+    stats = AuthorStats(author).get()
+    # Кнопка подписки зависит от пользователя и выводится вне общего кеша страницы
     author_info_dict = {
         "author": author,
         "post_list": post_list,
-        "group_list": group_list,
-        "number_of_records": number_of_records,
-        "subscribe": subscribe,
-        "subscribers": subscribers,
-        "following": following,
+        "group_list": stats["group_list"],
+        "number_of_records": stats["number_of_records"],
+        "subscribe": stats["subscribe"],
+        "subscribers": stats["subscribers"],
         }
     return author_info_dict
 
@@ -191,28 +234,37 @@ def profile_author(request, username):
 def follow_index(request):
     # Находим авторов, на которых подписан пользователь
     following = Follow.objects.filter(user=request.user).values_list("author")
-    # Получаем все посты авторов
-    post_list = Post.objects.select_related("author", "group").filter(author__in=following).annotate(comment_count=Count("post_comment")).order_by("-pub_date")
-
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    if timeline.push_mode():
+        # Читаем готовую ленту пользователя одним диапазоном индекса
+        entries = TimelineEntry.objects.select_related("post__author", "post__group").filter(user=request.user)
+        page, paginator = paginate_feed(request, entries, pk_field="post_id")
+        page.object_list = [entry.post for entry in page]
+    else:
+        # Получаем все посты авторов
+        post_list = Post.objects.select_related("author", "group").filter(author__in=following).order_by("-pub_date")
+        page, paginator = paginate_feed(request, post_list)
     return render(request, "follow.html", {"page": page, "paginator": paginator, "following": following})
 
 
+@primary_db
 @login_required
 # Подписаться на автора
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    follow = Follow.objects.filter(user = request.user, author = author).count()
-    if request.user != author and follow == 0:
-        follow = Follow.objects.create(user = request.user, author = author)
+    author = get_object_or_404(User, username=username)
+    # Уникальность подписки гарантирует ограничение unique_follow в БД
+    if request.user != author:
+        follow, created = Follow.objects.get_or_create(user=request.user, author=author)
+        if created and timeline.push_mode():
+            timeline.backfill(request.user, author)
     return redirect(f"/{username}/")
 
 
+@primary_db
 @login_required
 # Отписаться от автора
 def profile_unfollow(request, username):
     author = User.objects.get(username=username)
     follow = Follow.objects.filter(user = request.user, author = author).delete()
+    if timeline.push_mode():
+        timeline.prune(request.user, author)
     return redirect(f"/{username}/")
@@ -1,4 +1,27 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+# Тесты работают с отдельным кешем в памяти, а не с общим кешем сайта (posts.test_runner)
+@pytest.fixture(autouse=True, scope='session')
+def test_caches():
+    from posts.test_runner import test_caches
+    with test_caches():
+        yield
+
+
+# Страницы из кеша одного теста не должны попадать в другой
+@pytest.fixture(autouse=True)
+def clear_cache(test_caches):
+    from django.core.cache import cache
+    cache.clear()
+
+
+# Миниатюры создаем в потоке теста: фоновые потоки мешают очистке тестовой БД
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    settings.THUMBNAIL_WORKERS = 0
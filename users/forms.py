@@ -1,10 +1,29 @@
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.urls import URLResolver, get_resolver
 
 
 User = get_user_model()
 
 
+# Первые части адресов сайта (search, new, admin, static, ...). Страница пользователя /<username>/
+# с таким именем была бы недоступна - ее адрес перехватил бы другой маршрут.
+# Статику и медиа может отдавать не URLconf (runserver, веб-сервер), их префиксы добавляем всегда
+def reserved_usernames(patterns=None):
+    names = set()
+    if patterns is None:
+        names |= {url.strip("/").split("/")[0] for url in (settings.STATIC_URL, settings.MEDIA_URL)}
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        prefix = str(pattern.pattern).lstrip("^").split("/")[0]
+        if not prefix and isinstance(pattern, URLResolver):
+            names |= reserved_usernames(pattern.url_patterns)
+        elif prefix and not set("<(").intersection(prefix):
+            names.add(prefix)
+    return names
+
+
 #  создадим собственный класс для формы регистрации
 #  сделаем его наследником предустановленного класса UserCreationForm
 class CreationForm(UserCreationForm):
@@ -13,4 +32,10 @@ class CreationForm(UserCreationForm):
         # укажем модель, с которой связана создаваемая форма
         model = User
         # укажем, какие поля должны быть видны в форме и в каком порядке
-        fields = ("first_name", "last_name", "username", "email")
\ No newline at end of file
+        fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if username in reserved_usernames():
+            raise ValidationError("Это имя занято адресом сайта, выберите другое")
+        return username
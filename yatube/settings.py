@@ -37,7 +37,7 @@ ALLOWED_HOSTS = [
 # Application definition
 
 INSTALLED_APPS = [
-    'posts',
+    'posts.apps.PostsConfig',
     'users',
     "django.contrib.sites",
     "django.contrib.flatpages",
@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.middleware.QueryBudgetMiddleware',
+    'posts.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,8 +71,16 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса и не разбираются
+            # заново при каждом рендере (и при каждом {% include %}).
+            # Изменения шаблонов видны после перезапуска сервера
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -95,6 +105,23 @@ DATABASES = {
     }
 }
 
+# Реплики основной БД только для чтения (posts.replicas): YATUBE_DB_REPLICAS - пути
+# к файлам реплик через запятую. Запросы GET читают со случайной реплики, запись и
+# чтение в запросах с записью - основная БД. В тестах реплики указывают на тестовую основную БД
+DATABASE_REPLICAS = []
+for number, name in enumerate(filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['posts.replicas.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной БД (больше задержки репликации)
+REPLICA_STICKY_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -134,6 +161,14 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# Исходники статики (bootstrap/, jquery/). collectstatic собирает их в STATIC_ROOT с хешем
+# содержимого в именах файлов и сжатыми копиями .gz/.br (posts.staticfiles)
+STATICFILES_DIRS = [os.path.join(BASE_DIR, "assets")]
+STATICFILES_STORAGE = "posts.staticfiles.CompressedManifestStaticFilesStorage"
+# Отдавать собранную статику из STATIC_ROOT самим Django (posts.staticfiles.serve).
+# Работает только при DEBUG = False: в режиме DEBUG шаблоны ссылаются на имена без хеша,
+# а runserver отдает статику из исходников сам. Если статику отдает веб-сервер - False
+SERVE_STATIC = True
 
 
 MEDIA_URL = "/media/"
@@ -156,8 +191,83 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 SITE_ID = 1
 
 
+# Кеш, общий для всех процессов WSGI-сервера: файл SQLite (posts.cache_backends).
+# YATUBE_CACHE=locmem - отдельный кеш в памяти каждого процесса
+CACHE_BACKENDS = {
+        'sqlite': {
+                'BACKEND': 'posts.cache_backends.SQLiteCache',
+                'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')),
+                'OPTIONS': {
+                        'MAX_ENTRIES': 100000,
+                        # Проверять переполнение раз в CULL_EVERY записей процесса
+                        'CULL_EVERY': 100,
+                },
+        },
+        'locmem': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+}
+
 CACHES = {
+        'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'sqlite')],
+}
+
+# Кеш тестов (posts.test_runner и tests/conftest.py): в памяти процесса, отдельно от кеша сайта
+TEST_CACHES = {
         'default': {
                 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        }
-}
\ No newline at end of file
+                'LOCATION': 'tests',
+        },
+}
+
+TEST_RUNNER = 'posts.test_runner.TestRunner'
+
+# Время жизни страниц лент в кеше. Устаревшие страницы сбрасываются
+# версиями областей кеша при изменении данных (posts.feed_cache)
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Режим ленты подписок /follow/:
+# "pull" - собирается запросом при каждом открытии,
+# "push" - материализуется при публикации поста (posts.timeline)
+FOLLOW_FEED_MODE = "pull"
+
+
+# Количество фоновых потоков для обработки картинок: нормализация загрузок (posts.images)
+# и создание миниатюр (posts.thumbnails), 0 - обрабатывать в потоке запроса
+THUMBNAIL_WORKERS = 2
+
+# Нормализация загруженных картинок постов: наибольшая сторона, формат и качество сжатия.
+# Метаданные (EXIF и др.) при перекодировании удаляются
+IMAGE_MAX_SIZE = 2048
+IMAGE_FORMAT = "WEBP"
+IMAGE_QUALITY = 82
+
+
+# Бюджет SQL-запросов на запрос к сайту (по имени URL и методу) для posts.middleware.QueryBudgetMiddleware.
+# Превышение бюджета пишется в лог, тесты (posts/tests.py) проверяют его на холодном кеше
+# для авторизованного пользователя, запись - в обоих режимах ленты подписок.
+# Для страниц с карточками постов учтен один запрос миниатюр (posts.thumbnails.attach)
+QUERY_BUDGETS = {
+    ("index", "GET"): 4,
+    ("group", "GET"): 5,
+    ("author_current_group_posts", "GET"): 8,
+    ("follow_index", "GET"): 5,
+    ("profile", "GET"): 8,
+    ("admin_profile", "GET"): 8,
+    ("post", "GET"): 10,
+    ("post_comments", "GET"): 2,
+    ("post_edit", "GET"): 4,
+    ("post_edit", "POST"): 7,
+    ("new_post", "GET"): 3,
+    ("new_post", "POST"): 6,
+    ("add_comment", "POST"): 6,
+    ("profile_follow", "GET"): 9,
+    ("profile_unfollow", "GET"): 7,
+    ("search", "GET"): 9,
+    ("api_index", "GET"): 1,
+    ("api_group", "GET"): 2,
+    ("api_profile", "GET"): 2,
+    ("api_follow_index", "GET"): 3,
+    ("api_post_comments", "GET"): 2,
+}
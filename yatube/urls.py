@@ -13,12 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.contrib.flatpages import views
 from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
+from posts.staticfiles import serve as serve_static, serving_enabled as serving_static
 
 
 handler404 = "posts.views.page_not_found" # noqa
@@ -29,6 +32,9 @@ urlpatterns = [
     # импорт правил из приложения admin
     path("admin/", admin.site.urls),
 
+    # JSON API лент
+    path("api/v1/", include("posts.api_urls")),
+
     # импорт правил из приложения posts
     path("", include("posts.urls")),
 
@@ -52,6 +58,13 @@ urlpatterns += [
 ]
 
 
+# Статика из STATIC_ROOT со сжатыми копиями и долгим кешированием (posts.staticfiles),
+# только при DEBUG = False и SERVE_STATIC
+if serving_static():
+    urlpatterns += [
+        re_path(r"^%s(?P<path>.*)$" % re.escape(settings.STATIC_URL.lstrip("/")), serve_static),
+    ]
+
+
 if settings.DEBUG:
-        urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-        urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+        urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file